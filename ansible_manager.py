@@ -1,61 +1,66 @@
 #!/usr/bin/env python3
 import os
 import sys
-import subprocess
-import glob
-import yaml
+
+from ssh_mux_manager import ansible_env
+from metrics_manager import phase
+from role_lock_manager import install_roles, LOCK_FILE
+from playbook_scheduler import run_schedule, load_group_dependencies
+from inventory_manager import inventory_groups, INVENTORY_SCRIPT
+from fact_cache_manager import record_fact_cache_hits
+from tuning_manager import active_profile, profile_env
+from convergence_manager import plan_group_runs, successful_hosts, record_converged
+from event_manager import new_events_file, events_env, print_run_report
+from playbook_index_manager import extract_references, refresh_index, all_roles, parse_errors
+
+# Roles maintained in this repository; listed first in roles_path (ansible.cfg).
+LOCAL_ROLES_DIR = "roles"
 
 
 def find_roles_in_data(data, roles_set):
     """
-    Recursively traverse the YAML data structure to find role inclusion declarations.
-    When a key 'ansible.builtin.include_role' is found, if its value is a dict,
-    the function extracts the role name from the 'name' key and adds it to roles_set.
+    Recursively traverse the YAML data structure to find role inclusion declarations
+    (play-level "roles:", include_role and import_role) and add the role names to roles_set.
+    See playbook_index_manager.extract_references().
     """
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if key == "ansible.builtin.include_role":
-                if isinstance(value, dict):
-                    role_name = value.get("name")
-                    if role_name:
-                        roles_set.add(role_name)
-                elif isinstance(value, str):
-                    roles_set.add(value)
-            else:
-                find_roles_in_data(value, roles_set)
-    elif isinstance(data, list):
-        for element in data:
-            find_roles_in_data(element, roles_set)
-
-def obtain_roles():
+    roles_set.update(extract_references(data)["roles"])
+
+def obtain_roles(upgrade=False):
     """
-    Searches all YAML files in the "playbooks" directory for any occurrences
-    of a "roles:" key, builds a set of the roles found, and installs each role
-    via ansible-galaxy into ${HOME}/.ansible/roles.
+    Collects every role the playbooks in the "playbooks" directory need, including
+    roles reached through import_tasks/include_tasks chains, and installs each role
+    via ansible-galaxy into ${HOME}/.ansible/roles. Roles that exist in the
+    project's roles/ directory are not installed.
+
+    The playbooks are read through the persistent dependency index, so files that
+    haven't changed since the last run are not reparsed.
+
+    Roles whose installed copy matches roles.lock.yml are skipped. With
+    upgrade=True every role is reinstalled at its latest version and the
+    lockfile is refreshed.
     """
-    roles_found = set()
     playbooks_dir = "playbooks"
-    # Collect YAML files (both .yml and .yaml) in the playbooks directory.
-    yaml_files = glob.glob(os.path.join(playbooks_dir, "*.yml")) + glob.glob(os.path.join(playbooks_dir, "*.yaml"))
-    
-    if not yaml_files:
+    if not os.path.isdir(playbooks_dir):
         print("No YAML files found in the 'playbooks' directory.")
         return
 
-    for yaml_file in yaml_files:
-        try:
-            with open(yaml_file, "r") as f:
-                print(f"Examining YAML file: {yaml_file}.")
-                # In case a file has multiple YAML documents, use safe_load_all.
-                docs = yaml.safe_load_all(f)
-                for doc in docs:
-                    if doc is not None:
-                        find_roles_in_data(doc, roles_found)
-        except Exception as e:
-            print(f"Error processing file '{yaml_file}': {e}")
+    with phase("playbook_index"):
+        index = refresh_index(playbooks_dir)
+    if not index["files"]:
+        print("No YAML files found in the 'playbooks' directory.")
+        return
+    for yaml_file, error in parse_errors(index):
+        print(f"Error processing file '{yaml_file}': {error}")
+    roles_found = set(all_roles(index))
+
+    # Roles shipped with the project (roles/, see roles_path in ansible.cfg) are used in place.
+    local_roles = {role for role in roles_found if os.path.isdir(os.path.join(LOCAL_ROLES_DIR, role))}
+    if local_roles:
+        print(f"Using project roles from {LOCAL_ROLES_DIR}/: {', '.join(sorted(local_roles))}")
+    roles_found -= local_roles
 
     if not roles_found:
-        print("No roles found in the playbooks directory.")
+        print("No galaxy roles to install." if local_roles else "No roles found in the playbooks directory.")
         return
 
     print("Roles found in playbooks:")
@@ -71,38 +76,20 @@ def obtain_roles():
     roles_path = os.path.join(home, ".ansible", "roles")
     os.makedirs(roles_path, exist_ok=True)
 
-    # Install each role via ansible-galaxy.
-    for role in sorted(roles_found):
-        command = f"ansible-galaxy install {role} --roles-path {roles_path}"
-        print(f"Installing role: {role}")
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Error installing {role}:\n{result.stderr}")
-        else:
-            print(f"Successfully installed {role}")
+    # Install each role via ansible-galaxy, unless the lockfile says it is current.
+    with phase("install_roles"):
+        install_roles(roles_found, roles_path, upgrade=upgrade, lock_file=LOCK_FILE)
 
 def choose_inventory_groups():
     """
-    Reads 'inventory.ini' from the current directory, extracts group names,
-    and presents a numbered list with options to process one group, all groups, or exit.
+    Reads the group names from the dynamic inventory (built from host_vars, see
+    inventory_manager.build_inventory()) and presents a numbered list with options to process one group, all groups, or exit.
     Returns a list of group names or None if the user exits.
     """
-    inventory_file = "inventory.ini"
-    if not os.path.exists(inventory_file):
-        print(f"Error: {inventory_file} not found in the current directory.")
-        return None
-
-    groups = []
-    with open(inventory_file, "r") as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith("[") and line.endswith("]"):
-                group_name = line[1:-1].strip()
-                if group_name:
-                    groups.append(group_name)
+    groups = list(inventory_groups())
 
     if not groups:
-        print("No groups found in the inventory file.")
+        print("No groups found in the inventory.")
         return None
 
     print("Select a group to process:")
@@ -128,30 +115,104 @@ def choose_inventory_groups():
         else:
             print("Choice out of range. Please try again.")
 
-def run_group_playbooks(selected_groups):
+def run_group_playbooks(selected_groups, fork_budget=None, force=False):
     """
-    Iterates through the provided list of group names and, for each,
-    executes the playbook <group>.yml using the inventory file 'inventory.ini'.
-    
+    Executes the playbook <group>.yml for each of the provided group names,
+    using the dynamic inventory script (INVENTORY_SCRIPT).
+
+    Groups whose host sets don't overlap run concurrently, honouring the optional
+    order declared in group_dependencies.json and sharing one global fork budget
+    (ANSIBLE_FORK_BUDGET). Output from each run is prefixed with its group name.
+    After each run, the slowest tasks and per-host timing histograms are printed
+    from the run's JSON event stream (see event_manager.py), together with how many
+    hosts were served from the fact cache (see fact_cache_manager.py).
+
+    The active performance profile (see tuning_manager.py) sets the strategy and,
+    unless fork_budget or ANSIBLE_FORK_BUDGET is given, the fork budget.
+
+    Each playbook is limited to the hosts whose convergence fingerprint (playbook
+    tree, role versions, host vars) changed since their last successful run; groups
+    with no such host are not run (see convergence_manager.py). force=True runs
+    every host.
+
     Example command for group 'docker_hosts':
-      ansible-playbook -i inventory.ini docker_hosts.yml
+      ansible-playbook -i dynamic_inventory.py ./playbooks/docker_hosts.yml --forks 5 --limit erp1,erp2
+    Returns a dict mapping each group to its return code (None if skipped, 0 if
+    already converged).
     """
-    inventory_file = "inventory.ini"
-    for group in selected_groups:
-        playbook = f"{group}.yml"
-        command = f"ansible-playbook -i {inventory_file} ./playbooks/{playbook}"
-        print(f"Executing playbook for group '{group}': {command}")
-        result = subprocess.run(command, shell=True, stdout=sys.stdout, stderr=sys.stderr, text=True)
-        if result.returncode != 0:
-            print(f"Error executing playbook for group '{group}':\n{result.stderr}")
+    inventory_file = INVENTORY_SCRIPT
+    # Built once here; ansible-playbook then reads the same cached payload.
+    host_sets = inventory_groups()
+
+    profile = active_profile()
+    if profile:
+        print(f"Using performance profile '{profile['name']}': forks {profile['forks']}, "
+              f"strategy {profile['strategy']}.")
+        if fork_budget is None and "ANSIBLE_FORK_BUDGET" not in os.environ:
+            fork_budget = profile["forks"]
+
+    limits, fingerprints = plan_group_runs(selected_groups, host_sets, force=force)
+    converged_groups = [g for g in selected_groups if not limits[g]]
+    for group in converged_groups:
+        print(f"Group '{group}' is up to date on all {len(host_sets.get(group, []))} host(s); "
+              f"not running its playbook (use --force to run it anyway).")
+    groups_to_run = [g for g in selected_groups if limits[g]]
+    for group in groups_to_run:
+        if len(limits[group]) < len(host_sets.get(group, [])):
+            print(f"Group '{group}': {len(limits[group])} of {len(host_sets[group])} host(s) changed: "
+                  f"{', '.join(limits[group])}")
+
+    # Each run streams task events (callback_plugins/json_events.py) to its own file.
+    base_env = profile_env(profile, ansible_env())
+    events_files = {group: new_events_file(group) for group in groups_to_run}
+
+    def build_command(group, forks):
+        command = ["ansible-playbook", "-i", inventory_file, f"./playbooks/{group}.yml", "--forks", str(forks)]
+        if len(limits[group]) < len(host_sets.get(group, [])):
+            command += ["--limit", ",".join(limits[group])]
+        return command
+
+    def build_env(group):
+        return events_env(events_files[group], base_env)
+
+    try:
+        # Converged groups are left out, so groups depending on them start right away.
+        results = run_schedule(groups_to_run, limits, build_command,
+                               dependencies=load_group_dependencies(),
+                               fork_budget=fork_budget, build_env=build_env)
+    except ValueError as e:
+        print(f"Error scheduling playbooks: {e}")
+        return {}
+
+    results.update({group: 0 for group in converged_groups})
+    for group in groups_to_run:
+        returncode = results.get(group)
+        if returncode is not None:
+            record_converged(group, successful_hosts(events_files[group], limits[group], returncode),
+                             fingerprints[group])
+        if returncode is None:
+            print(f"Playbook for group '{group}' was not run.")
+        elif returncode != 0:
+            print(f"Error executing playbook for group '{group}' (exit code {returncode}).")
         else:
-            print(f"Successfully executed playbook for group '{group}'.\nOutput:\n{result.stdout}")
+            print(f"Successfully executed playbook for group '{group}'.")
+        if returncode is not None:
+            print_run_report(events_files[group], label=group)
+            # Hosts with cached facts skip fact gathering (gathering = smart).
+            record_fact_cache_hits(events_files[group], label=group)
+    return results
 
 if __name__ == "__main__":
+    if "--upgrade-roles" in sys.argv:
+        # Reinstall every role at its latest version and refresh roles.lock.yml.
+        obtain_roles(upgrade=True)
+        sys.exit(0)
+
     # For testing purposes, allow the user to choose groups and run playbooks.
+    # --force runs every host, even those already converged.
     selected_groups = choose_inventory_groups()
     if selected_groups:
-        run_group_playbooks(selected_groups)
+        run_group_playbooks(selected_groups, force="--force" in sys.argv)
     else:
         print("No groups selected or exiting.")
 
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Startup-time regression check for cli.py.
+
+Runs read-only cli.py commands in a synthetic project with warm caches
+(inventory, convergence ledger, fact cache) of --hosts hosts, each in a fresh
+interpreter, and records the median wall time. It also lists the modules each
+command imports (python -X importtime) and flags any of HEAVY_MODULES, which
+read-only commands must not load.
+
+Usage:
+  python benchmarks/bench_cli_startup.py [--hosts 100] [--repeats 15]
+      [--budget-ms 100] [--output FILE]
+
+Exits non-zero when a command's median exceeds --budget-ms or it imports a
+heavy module. Results are written to benchmarks/results/cli_startup.json.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+CLI = os.path.join(REPO_DIR, "cli.py")
+
+sys.path.insert(0, REPO_DIR)
+
+from convergence_manager import LEDGER_FILE, LEDGER_VERSION  # noqa: E402
+from fact_cache_manager import FACT_CACHE_DIR  # noqa: E402
+from inventory_manager import INVENTORY_CACHE_FILE, INVENTORY_CACHE_VERSION, inventory_from_configs  # noqa: E402
+
+# Read-only commands held to the startup budget.
+COMMANDS = [["status"], ["--help"]]
+HEAVY_MODULES = ["yaml", "config_manager", "vault_codec", "concurrent.futures.process",
+                 "ansible_manager", "preflight_manager"]
+
+
+def build_project(project_dir, count):
+    """Writes warm caches for count hosts; no host_vars are needed by read-only commands."""
+    configs = [{"host_alias": f"bench{i:04d}", "host_ip_or_name": f"10.0.{i // 250}.{i % 250 + 1}",
+                "ssh_user": "ubuntu", "ssh_port": "22", "inventory_groups": ["docker_hosts"]}
+               for i in range(count)]
+    payload, _ = inventory_from_configs(configs)
+    hosts = [conf["host_alias"] for conf in configs]
+    now = time.strftime("%Y-%m-%dT%H:%M:%S")
+    files = {
+        INVENTORY_CACHE_FILE: {"version": INVENTORY_CACHE_VERSION, "signature": {}, "inventory": payload},
+        LEDGER_FILE: {"version": LEDGER_VERSION,
+                      "groups": {"docker_hosts": {h: {"fingerprint": "0" * 64, "converged_at": now}
+                                                  for h in hosts}}},
+    }
+    for name, data in files.items():
+        path = os.path.join(project_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f)
+    facts_dir = os.path.join(project_dir, FACT_CACHE_DIR)
+    os.makedirs(facts_dir, exist_ok=True)
+    for host in hosts:
+        with open(os.path.join(facts_dir, host), "w") as f:
+            f.write("{}")
+
+
+def time_command(args, project_dir, env, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, CLI] + args, cwd=project_dir, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"cli.py {' '.join(args)} exited {result.returncode}")
+    return times
+
+
+def imported_modules(args, project_dir, env):
+    """Returns the modules a command imports, from python -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", CLI] + args, cwd=project_dir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            if name != "package":
+                modules.append(name)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hosts", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "cli_startup.json"))
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    env.pop("ANSIBLE_PERFORMANCE_PROFILE", None)
+    failures = 0
+    results = {}
+    with tempfile.TemporaryDirectory() as project_dir:
+        build_project(project_dir, args.hosts)
+        # Warm the bytecode cache so the first timed run isn't an outlier.
+        subprocess.run([sys.executable, CLI, "status"], cwd=project_dir, env=env, stdout=subprocess.DEVNULL)
+
+        baseline = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], env=env)
+            baseline.append(time.perf_counter() - start)
+        interpreter_ms = statistics.median(baseline) * 1000
+        print(f"Bare interpreter: {interpreter_ms:.1f} ms")
+        print(f"{'command':<12} {'median (ms)':>11} {'max (ms)':>9}  heavy imports")
+
+        for command in COMMANDS:
+            name = " ".join(command)
+            times = time_command(command, project_dir, env, args.repeats)
+            heavy = [m for m in imported_modules(command, project_dir, env) if m in HEAVY_MODULES]
+            median_ms = statistics.median(times) * 1000
+            over = median_ms > args.budget_ms
+            failures += over + bool(heavy)
+            results[name] = {"median_ms": median_ms, "max_ms": max(times) * 1000, "heavy_imports": heavy}
+            note = "  OVER BUDGET" if over else ""
+            print(f"{name:<12} {median_ms:>11.1f} {max(times) * 1000:>9.1f}  {', '.join(heavy) or '-'}{note}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({
+            "meta": {"hosts": args.hosts, "repeats": args.repeats, "budget_ms": args.budget_ms,
+                     "interpreter_ms": interpreter_ms, "python": platform.python_version(),
+                     "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results,
+        }, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {args.output}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmarks config_manager.load_host_configs_bulk() for 10, 100 and 1000 host files,
+decrypting sequentially (1 worker) and with the process pool (all available CPUs).
+
+Usage: python benchmarks/bench_load_all_configs.py [count ...]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml  # noqa: E402
+
+import config_manager  # noqa: E402
+import vault_codec  # noqa: E402
+
+PASSWORD = b"benchmark-password"
+DEFAULT_COUNTS = [10, 100, 1000]
+
+
+def _write_host_file(job):
+    host_vars_dir, index = job
+    alias = f"bench{index:04d}"
+    config = {
+        "host_alias": alias,
+        "host_ip_or_name": f"10.0.{index // 250}.{index % 250 + 1}",
+        "ssh_user": "ubuntu",
+        "ansible_become_pass": "secret",
+        "ssh_port": "22",
+        "identity_file": "id_rsa",
+        "wireguard_addresses": [f"10.8.{index // 250}.{index % 250 + 1}/24"],
+        "wireguard_peers": [],
+    }
+    plaintext = yaml.dump(config, default_flow_style=False, Dumper=yaml.SafeDumper, default_style='"')
+    vault_codec.encrypt_to_file(os.path.join(host_vars_dir, f"{alias}.yml"), plaintext, PASSWORD)
+
+
+def populate(host_vars_dir, count):
+    """Writes count encrypted host files; uses the pool since encryption also derives keys."""
+    with ProcessPoolExecutor(max_workers=config_manager.available_cpus()) as executor:
+        list(executor.map(_write_host_file, [(host_vars_dir, i) for i in range(count)], chunksize=16))
+
+
+def timed_load(host_vars_dir, workers):
+    # Start cold; otherwise the in-process key cache hides the PBKDF2 cost.
+    vault_codec._derive_keys.cache_clear()
+    start = time.perf_counter()
+    configs, errors = config_manager.load_host_configs_bulk(host_vars_dir, workers=workers)
+    elapsed = time.perf_counter() - start
+    assert not errors, errors
+    return elapsed, len(configs)
+
+
+def main(counts):
+    cpus = config_manager.available_cpus()
+    print(f"Available CPUs: {cpus}")
+    print(f"{'hosts':>6}  {'sequential (s)':>14}  {'parallel (s)':>12}  {'speedup':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        pass_file = os.path.join(tmp, ".vault_pass")
+        with open(pass_file, "wb") as f:
+            f.write(PASSWORD + b"\n")
+        config_manager.VAULT_PASS_FILE = pass_file
+
+        for count in counts:
+            host_vars_dir = os.path.join(tmp, f"host_vars_{count}")
+            os.makedirs(host_vars_dir)
+            populate(host_vars_dir, count)
+            sequential, loaded = timed_load(host_vars_dir, workers=1)
+            parallel, _ = timed_load(host_vars_dir, workers=cpus)
+            assert loaded == count
+            print(f"{count:>6}  {sequential:>14.3f}  {parallel:>12.3f}  {sequential / parallel:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_COUNTS)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the Python control layer end to end against stub executables.
+
+Every external program (ssh, sshpass, ssh-copy-id, sudo, ansible-vault,
+ansible-playbook, ansible-galaxy) is replaced by benchmarks/stubs/stub.py with
+configurable latency and failure rates. The real modules then run
+non-interactively against synthetic projects of 1, 10, 100 and 500 hosts. Each
+scenario runs in a fresh child process, and the harness records wall time,
+subprocess count and peak RSS.
+
+Usage:
+  python benchmarks/bench_orchestration.py [--hosts 1 10 100 500] [--latency 0.02]
+      [--failure-rate 0.1] [--scenarios preflight ...] [--output FILE]
+      [--baseline FILE] [--save-baseline]
+
+Results are written to benchmarks/results/latest.json. --save-baseline also
+copies them to benchmarks/results/baseline.json. --baseline compares against
+an earlier file and exits non-zero when a wall time regresses by more than
+--tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+STUB_SOURCE = os.path.join(BENCH_DIR, "stubs", "stub.py")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+STUB_NAMES = ["ssh", "sshpass", "ssh-copy-id", "sudo", "ansible-vault", "ansible-playbook", "ansible-galaxy"]
+VAULT_PASSWORD = b"benchmark-password"
+GROUP = "docker_hosts"
+
+DEFAULT_HOSTS = [1, 10, 100, 500]
+SCENARIOS = ["load_all_configs", "setup_ssh_access", "preflight", "obtain_roles",
+             "run_group_playbooks", "preAnsible"]
+
+
+# --- Scenarios (run inside the child process, with cwd set to the synthetic project) ---
+
+def scenario_load_all_configs():
+    from config_manager import load_all_configs
+    load_all_configs()
+
+
+def scenario_setup_ssh_access():
+    from config_manager import load_all_configs
+    from ssh_manager import setup_ssh_access
+    for target in load_all_configs():
+        setup_ssh_access(target, configure=True)
+
+
+def scenario_preflight():
+    from config_manager import load_all_configs
+    from preflight_manager import run_preflight, print_preflight_summary
+    print_preflight_summary(run_preflight(load_all_configs()))
+
+
+def scenario_obtain_roles():
+    from ansible_manager import obtain_roles
+    obtain_roles()
+
+
+def scenario_run_group_playbooks():
+    from ansible_manager import run_group_playbooks
+    run_group_playbooks([GROUP])
+
+
+def scenario_preAnsible():
+    # stdin carries the answers: "0" (save and continue), then "1" (first group).
+    from preAnsible import preAnsible
+    preAnsible()
+
+
+def run_child(scenario, result_file):
+    sys.path.insert(0, REPO_DIR)
+    func = globals()[f"scenario_{scenario}"]
+    start = time.perf_counter()
+    error = None
+    try:
+        func()
+    except (Exception, SystemExit) as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    result = {
+        "wall_s": wall,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_child_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "error": error,
+    }
+    with open(result_file, "w") as f:
+        json.dump(result, f)
+
+
+# --- Fixtures ---
+
+def install_stubs(bin_dir):
+    """Writes one copy of the stub per program name, using this interpreter directly."""
+    os.makedirs(bin_dir, exist_ok=True)
+    with open(STUB_SOURCE, "r") as f:
+        body = f.read().split("\n", 1)[1]
+    for name in STUB_NAMES:
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(f"#!{sys.executable}\n{body}")
+        os.chmod(path, 0o755)
+
+
+def build_project(project_dir, count):
+    """
+    Creates a synthetic project: encrypted host_vars, playbooks and schema. The
+    inventory is built from host_vars, where every host lands in the default group.
+    """
+    sys.path.insert(0, REPO_DIR)
+    import yaml
+    import vault_codec
+
+    host_vars = os.path.join(project_dir, "host_vars")
+    os.makedirs(host_vars)
+    shutil.copytree(os.path.join(REPO_DIR, "playbooks"), os.path.join(project_dir, "playbooks"))
+    shutil.copy(os.path.join(REPO_DIR, "config_schema.json"), project_dir)
+
+    for index in range(count):
+        alias = f"bench{index:04d}"
+        config = {
+            "host_alias": alias,
+            "host_ip_or_name": f"10.{index // 65536}.{index // 256 % 256}.{index % 256}",
+            "ssh_user": "ubuntu",
+            "ansible_become_pass": "secret",
+            "ssh_port": "22",
+            "identity_file": "id_rsa",
+            "wireguard_listen_port": "51820",
+            "wireguard_addresses": [f"10.8.{index // 250}.{index % 250 + 1}/24"],
+            "wireguard_private_key": "{{ lookup('file', '/etc/wireguard/privatekey') }}",
+            "wireguard_peers": [],
+        }
+        plaintext = yaml.dump(config, default_flow_style=False, Dumper=yaml.SafeDumper, default_style='"')
+        vault_codec.encrypt_to_file(os.path.join(host_vars, f"{alias}.yml"), plaintext, VAULT_PASSWORD)
+
+
+def fresh_home(home_dir):
+    """Creates a HOME with the vault password and SSH key files the modules expect."""
+    secrets = os.path.join(home_dir, ".ssh", "secrets")
+    os.makedirs(secrets)
+    with open(os.path.join(secrets, ".vault_pass"), "wb") as f:
+        f.write(VAULT_PASSWORD + b"\n")
+    for name in ("id_rsa", "id_rsa.pub"):
+        open(os.path.join(home_dir, ".ssh", name), "w").close()
+
+
+# --- Harness ---
+
+def run_scenario(scenario, count, project_template, bin_dir, args, work_dir):
+    """Runs one scenario in a fresh copy of the project and returns its measurements."""
+    run_dir = tempfile.mkdtemp(dir=work_dir, prefix=f"{scenario}-{count}-")
+    project_dir = os.path.join(run_dir, "project")
+    shutil.copytree(project_template, project_dir)
+    home_dir = os.path.join(run_dir, "home")
+    fresh_home(home_dir)
+    stub_log = os.path.join(run_dir, "stub.log")
+    result_file = os.path.join(run_dir, "result.json")
+
+    env = dict(os.environ)
+    env.update({
+        "HOME": home_dir,
+        "PATH": f"{bin_dir}{os.pathsep}{env.get('PATH', '')}",
+        "SUDO_ASKPASS": os.path.join(bin_dir, "sudo"),
+        "STUB_LOG": stub_log,
+        "STUB_STATE_DIR": os.path.join(run_dir, "stub-state"),
+        "STUB_LATENCY": str(args.latency),
+        "STUB_FAILURE_RATE": str(args.failure_rate),
+    })
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--run-scenario", scenario,
+                    "--result-file", result_file],
+                   cwd=project_dir, env=env, input="0\n1\n", text=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    process_wall = time.perf_counter() - start
+
+    with open(result_file, "r") as f:
+        result = json.load(f)
+    breakdown = {}
+    if os.path.exists(stub_log):
+        with open(stub_log, "r") as f:
+            for line in f:
+                breakdown[line.strip()] = breakdown.get(line.strip(), 0) + 1
+    result.update(process_wall_s=process_wall, subprocesses=sum(breakdown.values()),
+                  subprocess_breakdown=breakdown)
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return result
+
+
+def compare(results, baseline_file, tolerance):
+    """Prints current vs. baseline wall times; returns the number of regressions."""
+    with open(baseline_file, "r") as f:
+        baseline = json.load(f)["results"]
+    regressions = 0
+    print(f"\nComparison with {baseline_file} (tolerance {tolerance:.0%}):")
+    for scenario, per_count in results.items():
+        for count, current in per_count.items():
+            previous = baseline.get(scenario, {}).get(count)
+            if not previous:
+                continue
+            ratio = current["wall_s"] / previous["wall_s"] if previous["wall_s"] else float("inf")
+            flag = ""
+            if ratio > 1 + tolerance:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"  {scenario:<20} {count:>4} hosts: {previous['wall_s']:8.3f}s -> {current['wall_s']:8.3f}s "
+                  f"({ratio:5.2f}x), subprocesses {previous['subprocesses']} -> {current['subprocesses']}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, nargs="+", default=DEFAULT_HOSTS)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per stub invocation")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="fraction of hosts/calls that fail")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        run_child(args.run_scenario, args.result_file)
+        return 0
+
+    results = {scenario: {} for scenario in args.scenarios}
+    with tempfile.TemporaryDirectory(prefix="bench-orchestration-") as work_dir:
+        bin_dir = os.path.join(work_dir, "bin")
+        install_stubs(bin_dir)
+        print(f"{'scenario':<20} {'hosts':>5} {'wall (s)':>9} {'subprocs':>8} {'peak RSS (MB)':>13}  error")
+        for count in args.hosts:
+            project_template = os.path.join(work_dir, f"project-{count}")
+            build_project(project_template, count)
+            for scenario in args.scenarios:
+                result = run_scenario(scenario, count, project_template, bin_dir, args, work_dir)
+                results[scenario][str(count)] = result
+                print(f"{scenario:<20} {count:>5} {result['wall_s']:>9.3f} {result['subprocesses']:>8} "
+                      f"{result['peak_rss_kb'] / 1024:>13.1f}  {result['error'] or ''}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "latency_s": args.latency,
+            "failure_rate": args.failure_rate,
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        baseline_file = os.path.join(RESULTS_DIR, "baseline.json")
+        shutil.copy(args.output, baseline_file)
+        print(f"Baseline saved to {baseline_file}")
+    if args.baseline:
+        return 1 if compare(results, args.baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
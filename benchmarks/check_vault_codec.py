@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compatibility check for vault_codec.
+
+Verifies that encrypt()/decrypt() round-trip and that a wrong password is
+rejected. When ansible-core is importable, the output is also compared
+byte-for-byte with ansible.parsing.vault, and when ansible-vault is on PATH,
+files are exchanged with the CLI in both directions.
+
+Usage: python benchmarks/check_vault_codec.py
+
+Prints one line per check and exits non-zero if any check fails.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vault_codec  # noqa: E402
+from vault_codec import VaultError, decrypt, decrypt_file, encrypt, encrypt_to_file  # noqa: E402
+
+PASSWORD = b"correct horse battery staple"
+SAMPLES = ["", "a", "x" * 15, "y" * 16, "z" * 17, "host_alias: \"erp1\"\nssh_port: \"22\"\n",
+           "unicode: éè✓\n" * 40]
+
+
+def check_round_trip():
+    failures = []
+    for index, sample in enumerate(SAMPLES):
+        if decrypt(encrypt(sample, PASSWORD), PASSWORD) != sample:
+            failures.append(f"sample {index} does not round-trip")
+        if decrypt(encrypt(sample, PASSWORD, vault_id="prod"), PASSWORD) != sample:
+            failures.append(f"sample {index} does not round-trip with a vault id")
+    try:
+        decrypt(encrypt("secret", PASSWORD), b"wrong")
+        failures.append("decrypt accepted a wrong password")
+    except VaultError:
+        pass
+    return failures
+
+
+def check_ansible_library():
+    from ansible.parsing.vault import VaultAES256, VaultSecret, VaultLib
+
+    failures = []
+    salt = os.urandom(vault_codec.SALT_LENGTH)
+    secret = VaultSecret(PASSWORD)
+    for index, sample in enumerate(SAMPLES):
+        theirs = VaultAES256.encrypt(sample.encode(), secret, salt=salt)
+        ours = encrypt(sample, PASSWORD, salt=salt)
+        if ours.encode().split(b"\n", 1)[1].replace(b"\n", b"") != theirs.replace(b"\n", b""):
+            failures.append(f"sample {index} differs from ansible.parsing.vault output")
+        if VaultLib([("default", secret)]).decrypt(ours).decode() != sample:
+            failures.append(f"ansible.parsing.vault cannot decrypt sample {index}")
+    return failures
+
+
+def check_ansible_vault_cli():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pass_file = os.path.join(tmp, "pass")
+        with open(pass_file, "wb") as f:
+            f.write(PASSWORD + b"\n")
+        target = os.path.join(tmp, "host.yml")
+        encrypt_to_file(target, SAMPLES[5], PASSWORD)
+        viewed = subprocess.run(["ansible-vault", "view", target, "--vault-password-file", pass_file],
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        if viewed.returncode != 0 or viewed.stdout != SAMPLES[5]:
+            failures.append(f"ansible-vault view failed on our file: {viewed.stderr.strip()}")
+        with open(target, "w") as f:
+            f.write(SAMPLES[6])
+        encrypted = subprocess.run(["ansible-vault", "encrypt", target, "--encrypt-vault-id", "default",
+                                    "--vault-password-file", pass_file],
+                                   stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        if encrypted.returncode != 0:
+            failures.append(f"ansible-vault encrypt failed: {encrypted.stderr.strip()}")
+        elif decrypt_file(target, PASSWORD) != SAMPLES[6]:
+            failures.append("cannot decrypt a file written by ansible-vault")
+    return failures
+
+
+def main():
+    checks = [("Round trip", check_round_trip)]
+    try:
+        import ansible.parsing.vault  # noqa: F401
+        checks.append(("Byte compatibility with ansible.parsing.vault", check_ansible_library))
+    except ImportError:
+        print("ansible-core not importable; skipping byte-compatibility check.")
+    if shutil.which("ansible-vault"):
+        checks.append(("Interoperability with the ansible-vault CLI", check_ansible_vault_cli))
+    else:
+        print("ansible-vault not on PATH; skipping CLI interoperability check.")
+
+    failed = 0
+    for name, check in checks:
+        failures = check()
+        print(f"{name}: {'FAILED' if failures else 'OK'}")
+        for failure in failures:
+            print(f"  {failure}")
+        failed += bool(failures)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
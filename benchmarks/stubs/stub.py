@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the external programs the control layer runs (ssh, sshpass,
+ssh-copy-id, sudo, ansible-vault, ansible-playbook, ansible-galaxy).
+bench_orchestration.py links this script under each of those names and puts
+the directory first on PATH.
+
+Environment:
+  STUB_LOG                    file to which one line per invocation is appended
+  STUB_STATE_DIR              directory for state shared between invocations
+  STUB_LATENCY[_<NAME>]       seconds to sleep per invocation (default 0)
+  STUB_FAILURE_RATE[_<NAME>]  fraction of invocations/hosts that fail (default 0)
+<NAME> is the program name upper-cased with "-" replaced by "_", e.g. SSH_COPY_ID.
+Failures are derived from a hash of the target, so repeated runs behave the same.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+
+NAME = os.path.basename(sys.argv[0])
+ARGS = sys.argv[1:]
+
+
+def setting(key, default):
+    suffix = NAME.upper().replace("-", "_")
+    return float(os.environ.get(f"{key}_{suffix}", os.environ.get(key, default)))
+
+
+def fails(token):
+    """Deterministically decides whether token falls inside the configured failure rate."""
+    rate = setting("STUB_FAILURE_RATE", 0)
+    digest = hashlib.sha256(f"{NAME}:{token}".encode()).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32 < rate
+
+
+def destination():
+    """Returns the user@host argument of an ssh-style command line."""
+    for arg in reversed(ARGS):
+        if "@" in arg:
+            return arg
+    return ARGS[-1] if ARGS else ""
+
+
+def state_path(kind, token):
+    directory = os.path.join(os.environ.get("STUB_STATE_DIR", "/tmp/stub-state"), kind)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, hashlib.sha256(token.encode()).hexdigest())
+
+
+def ssh():
+    target = next((a for a in ARGS if "@" in a), destination())
+    if "-O" in ARGS:
+        # Control commands: a master exists once a connection to the target succeeded.
+        return 0 if os.path.exists(state_path("masters", target)) else 255
+    authorized = os.path.exists(state_path("keys", target))
+    if fails(target) and not authorized:
+        return 255
+    open(state_path("masters", target), "w").close()
+    return 0
+
+
+def ssh_copy_id():
+    target = destination()
+    if fails(target):
+        print(f"ssh-copy-id: ERROR: failed to copy key to {target}", file=sys.stderr)
+        return 1
+    open(state_path("keys", target), "w").close()
+    return 0
+
+
+def sshpass():
+    # sshpass -f <file> <command...>: run the wrapped stub in-process.
+    global NAME, ARGS
+    rest = ARGS[2:] if ARGS[:1] == ["-f"] else ARGS
+    NAME, ARGS = os.path.basename(rest[0]), rest[1:]
+    return dispatch()
+
+
+def sudo():
+    # Only the privileged writer (sh -c) consumes stdin; other commands must leave it alone.
+    if "-c" in ARGS:
+        sys.stdin.read()
+    return 0
+
+
+def ansible_galaxy():
+    # ansible-galaxy install <spec> --roles-path <path> [--force]
+    spec, roles_path = ARGS[1], ARGS[ARGS.index("--roles-path") + 1]
+    name, _, version = spec.partition(",")
+    if fails(name):
+        print(f"ERROR! - {name} was NOT installed successfully", file=sys.stderr)
+        return 1
+    meta = os.path.join(roles_path, name, "meta")
+    os.makedirs(meta, exist_ok=True)
+    with open(os.path.join(meta, "main.yml"), "w") as f:
+        f.write("galaxy_info: {}\n")
+    with open(os.path.join(meta, ".galaxy_install_info"), "w") as f:
+        f.write(f"install_date: '{time.time()}'\nversion: {version or '1.0.0'}\n")
+    return 0
+
+
+def ansible_playbook():
+    events_file = os.environ.get("ANSIBLE_JSON_EVENTS_FILE")
+    limit = ARGS[ARGS.index("--limit") + 1].split(",") if "--limit" in ARGS else ["stub-host"]
+    print(f"PLAY [{ARGS[-1] if ARGS else 'stub'}] ***")
+    if events_file:
+        with open(events_file, "a") as f:
+            now = time.time()
+            for index, task in enumerate(["Gathering Facts", "stub task"]):
+                uuid = f"stub-{index}"
+                f.write(json.dumps({"event": "task_start", "task": task, "task_uuid": uuid, "time": now}) + "\n")
+                for host in limit:
+                    f.write(json.dumps({"event": "runner_finish", "task": task, "task_uuid": uuid, "host": host,
+                                        "status": "ok", "changed": False, "time": now + 0.01}) + "\n")
+    return 1 if fails(" ".join(ARGS)) else 0
+
+
+def ansible_vault():
+    return 1 if fails(" ".join(ARGS)) else 0
+
+
+# First line of each program's version output, for the environment validator.
+VERSIONS = {
+    "sshpass": "sshpass 1.09",
+    "ansible-playbook": "ansible-playbook [core 2.16.0]",
+    "ansible-vault": "ansible-vault [core 2.16.0]",
+    "ansible-galaxy": "ansible-galaxy [core 2.16.0]",
+}
+
+HANDLERS = {
+    "ssh": ssh,
+    "ssh-copy-id": ssh_copy_id,
+    "sshpass": sshpass,
+    "sudo": sudo,
+    "ansible-galaxy": ansible_galaxy,
+    "ansible-playbook": ansible_playbook,
+    "ansible-vault": ansible_vault,
+}
+
+
+def dispatch():
+    time.sleep(setting("STUB_LATENCY", 0))
+    log = os.environ.get("STUB_LOG")
+    if log:
+        with open(log, "a") as f:
+            f.write(f"{NAME}\n")
+    if NAME in VERSIONS and ARGS in (["-V"], ["--version"]):
+        print(VERSIONS[NAME])
+        return 0
+    return HANDLERS.get(NAME, lambda: 0)()
+
+
+if __name__ == "__main__":
+    sys.exit(dispatch())
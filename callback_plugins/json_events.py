@@ -0,0 +1,91 @@
+"""
+Writes playbook, task and per-host runner events as JSON lines.
+
+Enabled through ansible.cfg (callbacks_enabled = json_events). Events are only
+written when ANSIBLE_JSON_EVENTS_FILE names the output file; run_group_playbooks
+sets it per group and event_manager.py reads the result.
+"""
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+DOCUMENTATION = '''
+    name: json_events
+    type: aggregate
+    short_description: Writes task start/finish events as JSON lines
+    description:
+      - Appends one JSON object per event to the file named by ANSIBLE_JSON_EVENTS_FILE.
+      - Used by event_manager.py to report per-task and per-host durations.
+    requirements:
+      - enable in ansible.cfg (callbacks_enabled)
+'''
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'json_events'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        path = os.environ.get('ANSIBLE_JSON_EVENTS_FILE')
+        self._out = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._out = open(path, 'a', buffering=1)
+
+    def _emit(self, event, **fields):
+        if self._out is None:
+            return
+        fields['event'] = event
+        fields['time'] = time.time()
+        self._out.write(json.dumps(fields, sort_keys=True) + '\n')
+
+    def _task_fields(self, task):
+        return {'task': task.get_name(), 'task_uuid': task._uuid, 'action': task.action}
+
+    def v2_playbook_on_start(self, playbook):
+        self._emit('playbook_start', playbook=playbook._file_name)
+
+    def v2_playbook_on_play_start(self, play):
+        self._emit('play_start', play=play.get_name())
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._emit('task_start', **self._task_fields(task))
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self._emit('task_start', handler=True, **self._task_fields(task))
+
+    def v2_runner_on_start(self, host, task):
+        self._emit('runner_start', host=host.get_name(), **self._task_fields(task))
+
+    def _runner_finish(self, result, status):
+        self._emit('runner_finish', host=result._host.get_name(), status=status,
+                   changed=bool(result._result.get('changed', False)), **self._task_fields(result._task))
+
+    def v2_runner_on_ok(self, result):
+        self._runner_finish(result, 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._runner_finish(result, 'ignored' if ignore_errors else 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        self._runner_finish(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self._runner_finish(result, 'unreachable')
+
+    def v2_playbook_on_stats(self, stats):
+        summary = dict((host, stats.summarize(host)) for host in sorted(stats.processed.keys()))
+        self._emit('playbook_stats', hosts=summary)
+        if self._out is not None:
+            self._out.close()
+            self._out = None
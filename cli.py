@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the control machine.
+
+  cli.py status                          cached inventory, convergence and fact cache state
+  cli.py preflight                       SSH preflight for every host, then /etc/hosts
+  cli.py hosts edit                      interactive host editor
+  cli.py hosts import FILE [--dry-run]   bulk import from a CSV/YAML manifest
+  cli.py hosts list                      hosts and addresses from the inventory
+  cli.py inventory [--refresh] [--write [FILE]]
+                                         show the inventory groups (or write an INI snapshot)
+  cli.py roles [--upgrade]               install the galaxy roles the playbooks need
+  cli.py run [--force] [group ...]       run group playbooks (prompts when no group is given)
+  cli.py setup [--force]                 the whole preAnsible flow
+
+Each command imports the managers it needs when it runs, so read-only commands
+such as status don't pay for yaml, the vault codec or the process pools.
+"""
+import os
+import sys
+import time
+
+
+def _option_value(args, option, default=None):
+    """Returns the value following option in args, default if it has none."""
+    if option not in args:
+        return None
+    position = args.index(option) + 1
+    if position < len(args) and not args[position].startswith("--"):
+        return args[position]
+    return default
+
+
+def _positional(args):
+    """Returns args without --options."""
+    return [arg for arg in args if not arg.startswith("--")]
+
+
+def cmd_status(args):
+    from inventory_manager import INVENTORY_CACHE_FILE, load_inventory_cache
+    from convergence_manager import load_ledger
+    from fact_cache_manager import FACT_CACHE_TIMEOUT, cache_files, load_stats
+    from tuning_manager import active_profile
+
+    cache = load_inventory_cache()
+    if cache is None:
+        print("Inventory: not built yet; run 'cli.py inventory'.")
+        groups = {}
+    else:
+        age = time.time() - os.path.getmtime(INVENTORY_CACHE_FILE)
+        groups = {group: data.get("hosts", []) for group, data in cache["inventory"].items() if group != "_meta"}
+        hosts = {h for members in groups.values() for h in members}
+        print(f"Inventory: {len(hosts)} host(s) in {len(groups)} group(s), cached {age / 60:.0f} min ago.")
+
+    ledger = load_ledger()["groups"]
+    for group, members in groups.items():
+        converged = ledger.get(group, {})
+        done = [h for h in members if h in converged]
+        last = max((converged[h]["converged_at"] for h in done), default="never")
+        print(f"  {group:<24} {len(done)}/{len(members)} converged, last {last}")
+
+    now = time.time()
+    cached = 0
+    for paths in cache_files().values():
+        ages = [now - os.path.getmtime(path) for path in paths if os.path.exists(path)]
+        cached += bool(ages) and min(ages) < FACT_CACHE_TIMEOUT
+    stats = load_stats()
+    total = stats["hits"] + stats["misses"]
+    rate = f", hit rate {stats['hits'] / total:.0%} over all runs" if total else ""
+    print(f"Fact cache: {cached} host(s) with fresh facts{rate}.")
+
+    profile = active_profile()
+    if profile:
+        print(f"Performance profile: {profile['name']} (forks {profile['forks']}, strategy {profile['strategy']})")
+    else:
+        print("Performance profile: none (defaults)")
+    return 0
+
+
+def cmd_preflight(args):
+    from config_manager import load_all_configs
+    from preflight_manager import run_preflight, print_preflight_summary, usable_targets
+    from host_manager import update_hosts_files
+
+    configs = load_all_configs()
+    results = run_preflight(configs)
+    print_preflight_summary(results)
+    update_hosts_files(usable_targets(configs, results))
+    return 1 if any(r["status"] == "failed" for r in results) else 0
+
+
+def cmd_hosts(args):
+    action = args[0] if args else "list"
+    if action == "edit":
+        from config_manager import edit_config
+        edit_config()
+        return 0
+    if action == "import" and len(args) > 1:
+        from config_manager import import_manifest
+        return 0 if import_manifest(args[1], dry_run="--dry-run" in args) else 1
+    if action == "list":
+        from inventory_manager import build_inventory
+        payload, errors = build_inventory()
+        for host_file, message in errors:
+            print(f"Error decrypting {host_file}: {message}")
+        for host, hostvars in payload["_meta"]["hostvars"].items():
+            print(f"{host:<24} {hostvars['ansible_user']}@{hostvars['ansible_host']}:{hostvars['ansible_port']}")
+        return 1 if errors else 0
+    print("Usage: cli.py hosts edit | import FILE [--dry-run] | list")
+    return 1
+
+
+def cmd_inventory(args):
+    from inventory_manager import build_inventory, generate_inventory, inventory_groups
+
+    if "--write" in args:
+        generate_inventory(_option_value(args, "--write", "inventory.ini"))
+        return 0
+    payload, errors = build_inventory(refresh="--refresh" in args)
+    for host_file, message in errors:
+        print(f"Error decrypting {host_file}: {message}")
+    for group, hosts in inventory_groups(payload).items():
+        print(f"[{group}] {' '.join(hosts)}")
+    return 1 if errors else 0
+
+
+def cmd_roles(args):
+    from ansible_manager import obtain_roles
+    obtain_roles(upgrade="--upgrade" in args)
+    return 0
+
+
+def cmd_run(args):
+    from ansible_manager import choose_inventory_groups, run_group_playbooks
+    from inventory_manager import inventory_groups
+
+    groups = _positional(args)
+    if groups:
+        known = inventory_groups()
+        unknown = [group for group in groups if group not in known]
+        if unknown:
+            print(f"Unknown group(s): {', '.join(unknown)}. Inventory groups: {', '.join(known) or 'none'}")
+            print("Usage: cli.py run [--force] [group ...]")
+            return 1
+    else:
+        groups = choose_inventory_groups()
+    if not groups:
+        print("No groups selected or exiting.")
+        return 0
+    results = run_group_playbooks(groups, force="--force" in args)
+    # An empty result means the run could not be scheduled at all.
+    return 1 if not results or any(rc != 0 for rc in results.values()) else 0
+
+
+def cmd_setup(args):
+    from preAnsible import preAnsible
+    preAnsible()
+    return 0
+
+
+# name: (handler, one-line description)
+COMMANDS = {
+    "status": (cmd_status, "cached inventory, convergence and fact cache state"),
+    "preflight": (cmd_preflight, "SSH preflight for every host, then /etc/hosts"),
+    "hosts": (cmd_hosts, "edit | import FILE [--dry-run] | list"),
+    "inventory": (cmd_inventory, "[--refresh] [--write [FILE]]"),
+    "roles": (cmd_roles, "[--upgrade]"),
+    "run": (cmd_run, "[--force] [group ...]"),
+    "setup": (cmd_setup, "the whole preAnsible flow [--force]"),
+}
+
+
+def usage():
+    print("Usage: cli.py COMMAND [args]\n")
+    for name, (_, description) in COMMANDS.items():
+        print(f"  {name:<10} {description}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        usage()
+        return 0 if argv[:1] in ([], ["-h"], ["--help"]) else 1
+    handler, _ = COMMANDS[argv[0]]
+    return handler(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
 import os
+import re
+import sys
+import csv
+import copy
+import hashlib
 import json
-import subprocess
 import yaml
 import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics_manager import phase
+from vault_codec import decrypt_file, encrypt_to_file, read_vault_password, VaultError
 
 # Directory where host-specific variables are stored.
 HOST_VARS_DIR = "host_vars"
@@ -11,6 +19,8 @@ HOST_VARS_DIR = "host_vars"
 VAULT_PASS_FILE = os.path.expanduser("~/.ssh/secrets/.vault_pass")
 # Path to the configuration schema JSON file.
 SCHEMA_FILE = "config_schema.json"
+# Below this many host files, decrypt/encrypt in-process instead of starting a process pool.
+PARALLEL_VAULT_THRESHOLD = 8
 
 def load_schema():
     """
@@ -27,71 +37,197 @@ def load_schema():
 def load_host_config(host):
     """
     Loads and returns the decrypted YAML content from host_vars/<host>.yml.
-    Uses the ansible-vault view command.
+    Decrypts in-process with vault_codec.
     """
     host_file = os.path.join(HOST_VARS_DIR, f"{host}.yml")
     if not os.path.exists(host_file):
         return {}
     try:
-        result = subprocess.run(
-            ["ansible-vault", "view", host_file, "--vault-password-file", VAULT_PASS_FILE],
-            capture_output=True, text=True, check=True
-        )
-        data = yaml.safe_load(result.stdout)
-        return data if data is not None else {}
-    except subprocess.CalledProcessError as e:
-        print(f"Error decrypting {host_file}: {e.stderr}")
+        password = read_vault_password(VAULT_PASS_FILE)
+    except VaultError as e:
+        print(f"Error decrypting {host_file}: {e}")
+        return {}
+    _, data, error = _decrypt_host_file((host_file, password))
+    if error is not None:
+        print(f"Error decrypting {host_file}: {error}")
         return {}
+    return data
+
+def render_host_config(config):
+    """Returns the plaintext YAML written (encrypted) to a host_vars file."""
+    return yaml.dump(config, default_flow_style=False, allow_unicode=True, Dumper=yaml.SafeDumper, default_style='"')
 
 def save_host_config(host, config):
     """
-    Writes the given host configuration dictionary to host_vars/<host>.yml in plaintext,
-    then encrypts it using ansible-vault with vault-id "default".
+    Encrypts the given host configuration dictionary (vault-id "default") and
+    atomically replaces host_vars/<host>.yml; the plaintext never touches the disk.
     """
     os.makedirs(HOST_VARS_DIR, exist_ok=True)
     host_file = os.path.join(HOST_VARS_DIR, f"{host}.yml")
-    # Dump config to plaintext YAML.
-    with open(host_file, "w") as f:
-        yaml.dump(config, f, default_flow_style=False, allow_unicode=True, Dumper=yaml.SafeDumper, default_style='"')
-    # Encrypt the file using ansible-vault with a vault-id of "default".
     try:
-        subprocess.run(
-            [
-                "ansible-vault", "encrypt", host_file,
-                "--encrypt-vault-id", "default",
-                "--vault-password-file", VAULT_PASS_FILE
-            ],
-            capture_output=True, text=True, check=True
-        )
+        encrypt_to_file(host_file, render_host_config(config), read_vault_password(VAULT_PASS_FILE))
         print(f"Configuration for host '{host}' saved and encrypted.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error encrypting {host_file}: {e.stderr}")
+    except VaultError as e:
+        print(f"Error encrypting {host_file}: {e}")
+
+def config_fingerprint(config):
+    """Returns a canonical SHA-256 hash of a host configuration dictionary."""
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def diff_config(old, new):
+    """Returns the sorted list of keys whose values differ between two host configurations."""
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+def available_cpus():
+    """Returns the number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _decrypt_host_file(job):
+    """
+    Worker for load_host_configs_bulk(); runs in a separate process.
+    job is a (host_file, password) tuple. Returns (host_file, data, error) where
+    exactly one of data and error is None.
+    """
+    host_file, password = job
+    try:
+        data = yaml.safe_load(decrypt_file(host_file, password))
+    except (VaultError, yaml.YAMLError, UnicodeDecodeError) as e:
+        return host_file, None, str(e)
+    if data is None:
+        return host_file, {}, None
+    if not isinstance(data, dict):
+        return host_file, None, f"expected a mapping of host variables, got {type(data).__name__}"
+    return host_file, data, None
+
+def load_host_configs_bulk(host_vars_dir=None, workers=None):
+    """
+    Decrypts every <host>.yml in host_vars_dir (default HOST_VARS_DIR).
+    Files are decrypted in a process pool sized to the available CPUs, since the
+    vault key derivation (PBKDF2) is CPU bound. Small batches are decrypted in
+    this process because starting the pool would cost more than it saves.
+
+    Returns (configs, errors): configs is a list of dictionaries sorted by file name,
+    errors is a list of (host_file, message) tuples for files that failed.
+    """
+    host_vars_dir = host_vars_dir or HOST_VARS_DIR
+    os.makedirs(host_vars_dir, exist_ok=True)
+    host_files = sorted(os.path.join(host_vars_dir, f) for f in os.listdir(host_vars_dir) if f.endswith(".yml"))
+    if not host_files:
+        return [], []
+    try:
+        password = read_vault_password(VAULT_PASS_FILE)
+    except VaultError as e:
+        return [], [(f, str(e)) for f in host_files]
+
+    workers = min(workers or available_cpus(), len(host_files))
+    jobs = [(f, password) for f in host_files]
+    if workers <= 1 or len(host_files) < PARALLEL_VAULT_THRESHOLD:
+        results = map(_decrypt_host_file, jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() yields in submission order, which keeps the result order stable.
+            results = list(executor.map(_decrypt_host_file, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+    configs, errors = [], []
+    for host_file, data, error in results:
+        if error is not None:
+            errors.append((host_file, error))
+            continue
+        data.setdefault("host_alias", os.path.basename(host_file)[:-4])
+        configs.append(data)
+    return configs, errors
 
 def load_all_configs():
     """
     Loads all decrypted host configuration files from HOST_VARS_DIR.
-    Returns a list of host configuration dictionaries.
+    Returns a list of host configuration dictionaries, ordered by file name.
     Each file is expected to be named <host_alias>.yml.
+    Files that cannot be decrypted are reported and left out.
     """
-    configs = []
-    if not os.path.exists(HOST_VARS_DIR):
-        os.makedirs(HOST_VARS_DIR, exist_ok=True)
-    for file in os.listdir(HOST_VARS_DIR):
-        if file.endswith(".yml"):
-            host = file[:-4]
-            config = load_host_config(host)
-            if config is not None:
-                if "host_alias" not in config:
-                    config["host_alias"] = host
-                configs.append(config)
+    with phase("load_all_configs"):
+        configs, errors = load_host_configs_bulk()
+    for host_file, message in errors:
+        print(f"Error decrypting {host_file}: {message}")
     return configs
 
+def _encrypt_host_file(job):
+    """
+    Worker for save_host_configs(); runs in a separate process.
+    job is a (host_file, plaintext, password) tuple. Returns (host_file, error).
+    """
+    host_file, plaintext, password = job
+    try:
+        encrypt_to_file(host_file, plaintext, password)
+        return host_file, None
+    except VaultError as e:
+        return host_file, str(e)
+
+def save_host_configs(configs, workers=None):
+    """
+    Encrypts and atomically replaces host_vars/<host_alias>.yml for every configuration.
+    Like load_host_configs_bulk(), large batches are encrypted in a process pool.
+    Returns the list of (host_file, message) tuples for files that could not be written.
+    """
+    os.makedirs(HOST_VARS_DIR, exist_ok=True)
+    try:
+        password = read_vault_password(VAULT_PASS_FILE)
+    except VaultError as e:
+        return [(os.path.join(HOST_VARS_DIR, f"{c['host_alias']}.yml"), str(e)) for c in configs]
+
+    jobs = [(os.path.join(HOST_VARS_DIR, f"{c['host_alias']}.yml"), render_host_config(c), password)
+            for c in configs]
+    workers = min(workers or available_cpus(), len(jobs))
+    if workers <= 1 or len(jobs) < PARALLEL_VAULT_THRESHOLD:
+        results = list(map(_encrypt_host_file, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_encrypt_host_file, jobs))
+    return [(host_file, error) for host_file, error in results if error is not None]
+
+def save_changed_configs(configs, originals):
+    """
+    Compares each configuration with its original (None for a new host), prints a
+    summary of the hosts and fields that changed, and writes only those hosts.
+    originals must be deep copies taken before editing, in the same order as configs.
+    Returns a dict mapping host_alias to the list of changed fields.
+    """
+    changes = {}
+    to_save = []
+    for conf, original in zip(configs, originals):
+        alias = conf["host_alias"]
+        if original is None:
+            changes[alias] = ["(new host)"]
+        elif config_fingerprint(conf) == config_fingerprint(original):
+            continue
+        else:
+            changes[alias] = diff_config(original, conf)
+        to_save.append(conf)
+
+    if not changes:
+        print("\nNo host configurations changed; nothing to save.")
+        return changes
+
+    print("\nChanged hosts:")
+    for alias, fields in changes.items():
+        print(f"  {alias}: {', '.join(fields)}")
+    errors = save_host_configs(to_save)
+    for host_file, message in errors:
+        print(f"Error encrypting {host_file}: {message}")
+    print(f"Saved {len(to_save) - len(errors)} of {len(to_save)} changed host configuration(s).")
+    return changes
+
 def edit_config():
     """
     Provides an interactive command-line interface to view, add, or edit host configurations.
     It uses a schema (loaded from config_schema.json) to prompt for each parameter.
     For each key defined in the schema, a handler function (specified by the schema)
     is dynamically loaded from the 'handlers' module and called to prompt for a new value.
+    Changes are kept in memory and, on "0", only hosts that differ from what was
+    loaded are written back (see save_changed_configs()).
     Returns a list of host configuration dictionaries.
     """
     schema = load_schema()
@@ -106,6 +242,10 @@ def edit_config():
         return []
 
     configs = load_all_configs()
+    # Snapshot of each host as loaded (None for hosts added in this session),
+    # so only hosts that actually changed are re-encrypted when we finish.
+    originals = [copy.deepcopy(conf) for conf in configs]
+    ipam_index = None
     while True:
         print("\nCurrent Hosts:")
         if configs:
@@ -119,20 +259,41 @@ def edit_config():
         print("N. Add a new host")
         choice = input("Enter number to edit, 0 to continue, or N to add a host: ").strip().lower()
         if choice == "0":
+            save_changed_configs(configs, originals)
             break
         elif choice == "n":
             new_conf = {}
             for key, meta in schema.items():
                 full_name = meta.get("full_name", key)
                 default_val = meta.get("default", "")
+                if key == "wireguard_addresses":
+                    # Offer the next free address instead of the shared schema default.
+                    import ipam_manager
+                    if ipam_index is None:
+                        ipam_index = ipam_manager.refresh_ipam()
+                        ipam_manager.assign_addresses(ipam_index, configs, set())
+                    try:
+                        default_val = [ipam_manager.allocate(ipam_index)]
+                    except ValueError as e:
+                        print(f"Warning: {e}")
                 handler_name = meta.get("handler", "edit_string")
                 handler_func = getattr(handlers_module, handler_name)
                 new_val = handler_func(None, default_val, full_name)
                 new_conf[key] = new_val
-            # Save new configuration using the host_alias as filename.
+            # The new configuration is saved, using the host_alias as filename, on "0".
             if "host_alias" in new_conf and new_conf["host_alias"]:
-                save_host_config(new_conf["host_alias"], new_conf)
-                configs.append(new_conf)
+                # Addresses typed over the offered one are checked like an import's.
+                problems = []
+                if ipam_index is not None:
+                    problems = ipam_manager.assign_addresses(ipam_index, configs + [new_conf],
+                                                             set()).get(new_conf["host_alias"], [])
+                if problems:
+                    for problem in problems:
+                        print(f"{new_conf['host_alias']}: {problem}")
+                    print("Skipping entry.")
+                else:
+                    configs.append(new_conf)
+                    originals.append(None)
             else:
                 print("host_alias is required; skipping entry.")
         else:
@@ -150,13 +311,153 @@ def edit_config():
                     handler_func = getattr(handlers_module, handler_name)
                     new_val = handler_func(current_val, meta.get("default", ""), full_name)
                     conf[key] = new_val
-                save_host_config(conf["host_alias"], conf)
                 configs[index] = conf
+                if "wireguard_addresses" in schema:
+                    import ipam_manager
+                    if ipam_index is None:
+                        ipam_index = ipam_manager.refresh_ipam()
+                    problems = ipam_manager.assign_addresses(ipam_index, configs, set())
+                    for problem in problems.get(conf.get("host_alias"), []):
+                        print(f"Warning: {conf.get('host_alias')}: {problem}")
             except (ValueError, IndexError):
                 print("Invalid selection, try again.")
     return configs
 
+def read_manifest(manifest_file):
+    """
+    Reads a host manifest and returns its rows as a list of dictionaries.
+    CSV files need a header row of schema keys. YAML files hold either a list of
+    host mappings or a mapping with a "hosts" list.
+    """
+    if manifest_file.endswith(".csv"):
+        with open(manifest_file, "r", newline="") as f:
+            return [dict(row) for row in csv.DictReader(f)]
+    with open(manifest_file, "r") as f:
+        data = yaml.safe_load(f)
+    if isinstance(data, dict):
+        data = data.get("hosts")
+    if not isinstance(data, list):
+        raise ValueError("manifest must be a list of hosts or a mapping with a 'hosts' list")
+    return data
+
+def _check_port(value):
+    try:
+        return 1 <= int(value) <= 65535
+    except (TypeError, ValueError):
+        return False
+
+def build_config_from_row(row, schema, handlers_module, existing=None):
+    """
+    Builds a host configuration from one manifest row without prompting.
+    Values missing from the row come from the existing configuration (when updating
+    a host) or from the schema default; every value goes through the normalize_*
+    counterpart of the field's handler. Returns (config, errors).
+    """
+    errors = []
+    # csv.DictReader puts values beyond the header under the key None.
+    if None in row:
+        errors.append("row has more fields than the header")
+    unknown = sorted(key for key in row if key is not None and key not in schema)
+    if unknown:
+        errors.append(f"unknown field(s): {', '.join(unknown)}")
+
+    config = copy.deepcopy(existing) if existing else {}
+    for key, meta in schema.items():
+        raw = row.get(key)
+        if raw is None or raw == "":
+            if key in config:
+                continue
+            raw = None
+        handler_name = meta.get("handler", "edit_string").replace("edit_", "normalize_", 1)
+        normalize = getattr(handlers_module, handler_name)
+        try:
+            config[key] = normalize(raw, copy.deepcopy(meta.get("default", "")))
+        except ValueError as e:
+            errors.append(f"{key}: {e}")
+
+    if not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9._-]*", config.get("host_alias") or ""):
+        errors.append("host_alias is required and may only contain letters, digits, '.', '_' and '-'")
+    if not config.get("host_ip_or_name"):
+        errors.append("host_ip_or_name is required")
+    for key in ("ssh_port", "wireguard_listen_port"):
+        if key in schema and not _check_port(config.get(key)):
+            errors.append(f"{key} must be a port number, got {config.get(key)!r}")
+    return config, errors
+
+def import_manifest(manifest_file, dry_run=False):
+    """
+    Adds or updates hosts from a CSV/YAML manifest without prompting.
+    Every row is validated before anything is written; if any row is invalid all
+    errors are printed and nothing is saved. Otherwise all changed host_vars files
+    are written in one batch (see save_changed_configs()).
+    Returns True on success.
+    """
+    schema = load_schema()
+    if not schema:
+        print("No schema loaded; cannot proceed.")
+        return False
+    handlers_module = importlib.import_module("handlers")
+    try:
+        rows = read_manifest(manifest_file)
+    except (OSError, ValueError, yaml.YAMLError, csv.Error) as e:
+        print(f"Error reading manifest {manifest_file}: {e}")
+        return False
+
+    existing = {conf["host_alias"]: conf for conf in load_all_configs()}
+    configs, originals, problems = [], [], []
+    seen = {}
+    allocate_for = set()
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            problems.append(f"row {number}: expected a mapping of fields")
+            continue
+        alias = str(row.get("host_alias") or "").strip()
+        config, errors = build_config_from_row(row, schema, handlers_module, existing.get(alias))
+        if alias in seen:
+            errors.append(f"duplicate host_alias (also on row {seen[alias]})")
+        seen.setdefault(alias, number)
+        problems.extend(f"row {number} ({alias or '?'}): {error}" for error in errors)
+        configs.append(config)
+        originals.append(existing.get(alias))
+        if alias not in existing and not row.get("wireguard_addresses"):
+            allocate_for.add(alias)
+
+    # New hosts without explicit addresses get the next free ones; every address is
+    # checked against the rest of the fleet and the manifest.
+    import ipam_manager
+    index = ipam_manager.refresh_ipam()
+    valid = [conf for conf in configs if conf.get("host_alias")]
+    for alias, errors in ipam_manager.assign_addresses(index, valid, allocate_for).items():
+        problems.extend(f"{alias}: {error}" for error in errors)
+
+    if problems:
+        print(f"Manifest {manifest_file} has {len(problems)} problem(s); nothing was written:")
+        for problem in problems:
+            print(f"  {problem}")
+        return False
+
+    new_hosts = sum(1 for original in originals if original is None)
+    print(f"Manifest {manifest_file}: {len(configs)} host(s), {new_hosts} new, {len(configs) - new_hosts} existing.")
+    if dry_run:
+        for conf, original in zip(configs, originals):
+            fields = ["(new host)"] if original is None else diff_config(original, conf)
+            if fields:
+                print(f"  {conf['host_alias']}: {', '.join(fields)}")
+        print("Dry run; nothing was written.")
+        return True
+    save_changed_configs(configs, originals)
+    return True
+
 if __name__ == "__main__":
+    # Usage: config_manager.py                       interactive editor
+    #        config_manager.py --import FILE [--dry-run]   bulk import from a CSV/YAML manifest
+    if "--import" in sys.argv:
+        position = sys.argv.index("--import") + 1
+        if position >= len(sys.argv):
+            print("Usage: config_manager.py --import FILE [--dry-run]")
+            sys.exit(1)
+        sys.exit(0 if import_manifest(sys.argv[position], dry_run="--dry-run" in sys.argv) else 1)
+
     all_configs = edit_config()
     print("\nFinal host configurations:")
     for conf in all_configs:
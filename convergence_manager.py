@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Convergence ledger: remembers, per group playbook and host, the fingerprint of
+everything the host was last successfully converged with (playbook dependency
+tree, role versions, decrypted host vars, and the members and addresses of the
+groups the playbook depends on). run_group_playbooks() limits each run to hosts
+whose fingerprint changed.
+
+  convergence_manager.py status [group ...]    show which hosts are up to date
+  convergence_manager.py forget [host ...]     drop ledger entries (all if none)
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+
+from event_manager import read_events
+
+LEDGER_FILE = os.path.join(".cache", "convergence.json")
+LEDGER_VERSION = 1
+# The fingerprinting helpers below import the config, playbook index and role lock
+# managers (yaml, vault codec, process pool) when called, so reading the ledger
+# (e.g. for "cli.py status") stays cheap.
+# Where roles that aren't pinned in the lockfile are looked up for their checksum.
+ROLE_SEARCH_PATHS = ["roles", os.path.join(os.path.expanduser("~"), ".ansible", "roles")]
+
+
+def load_ledger(ledger_file=LEDGER_FILE):
+    """Returns the ledger: {"version": ..., "groups": {group: {host: entry}}}."""
+    try:
+        with open(ledger_file, "r") as f:
+            ledger = json.load(f)
+        if ledger.get("version") == LEDGER_VERSION:
+            return ledger
+    except (OSError, ValueError):
+        pass
+    return {"version": LEDGER_VERSION, "groups": {}}
+
+
+def save_ledger(ledger, ledger_file=LEDGER_FILE):
+    """Atomically writes the ledger."""
+    os.makedirs(os.path.dirname(ledger_file), exist_ok=True)
+    temp_name = f"{ledger_file}.{os.getpid()}.tmp"
+    with open(temp_name, "w") as f:
+        json.dump(ledger, f, indent=1, sort_keys=True)
+    os.replace(temp_name, ledger_file)
+
+
+def _role_fingerprint(role, lock):
+    from role_lock_manager import role_checksum
+    entry = lock.get(role)
+    if entry:
+        return f"{entry.get('version', '')}:{entry.get('checksum', '')}"
+    for roles_path in ROLE_SEARCH_PATHS:
+        role_dir = os.path.join(roles_path, role)
+        if os.path.isdir(role_dir):
+            return role_checksum(role_dir)
+    return "missing"
+
+
+def playbook_fingerprint(playbook, index=None, lock=None):
+    """
+    Returns a SHA-256 over the content hashes of playbook and every task file it
+    pulls in, and the locked version/checksum of every role it uses.
+    """
+    from playbook_index_manager import PLAYBOOKS_DIR, refresh_index, playbook_dependencies
+    from role_lock_manager import LOCK_FILE, load_lock
+    index = index if index is not None else refresh_index(PLAYBOOKS_DIR)
+    lock = lock if lock is not None else load_lock(LOCK_FILE)
+    deps = playbook_dependencies(index, playbook)
+    digest = hashlib.sha256()
+    for path in [os.path.normpath(playbook)] + deps["task_files"] + deps["missing"]:
+        entry = index["files"].get(path)
+        digest.update(f"file {path} {entry['sha256'] if entry else 'missing'}\n".encode("utf-8"))
+    for role in deps["roles"]:
+        digest.update(f"role {role} {_role_fingerprint(role, lock)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def dependency_fingerprint(group, host_sets, configs, dependencies):
+    """
+    Returns a SHA-256 over the members of the groups group depends on (see
+    group_dependencies.json) and the addresses clients reach them on, so adding or
+    re-addressing e.g. an apt cache host re-runs the hosts that use it.
+    """
+    digest = hashlib.sha256()
+    for dependency in sorted(dependencies.get(group, [])):
+        digest.update(f"group {dependency}\n".encode("utf-8"))
+        for host in host_sets.get(dependency, []):
+            conf = configs.get(host, {})
+            addresses = ",".join(str(a) for a in conf.get("wireguard_addresses") or [])
+            digest.update(f"host {host} {conf.get('host_ip_or_name', '')} {addresses}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def host_fingerprints(playbook, hosts, configs, index=None, lock=None, context=""):
+    """
+    Returns {host: fingerprint} combining the playbook fingerprint, context (e.g. a
+    dependency_fingerprint()) and each host's decrypted configuration (configs maps
+    host_alias to its configuration).
+    """
+    from config_manager import config_fingerprint
+    base = playbook_fingerprint(playbook, index, lock) + context
+    return {host: hashlib.sha256(f"{base}:{config_fingerprint(configs.get(host, {}))}".encode("utf-8")).hexdigest()
+            for host in hosts}
+
+
+def plan_group_runs(groups, host_sets, force=False, ledger=None):
+    """
+    Works out which hosts of each group need the group playbook.
+    Returns (limits, fingerprints): limits maps each group to the hosts to run
+    (all of them when force is True), fingerprints maps each group to {host: fingerprint}.
+    """
+    from config_manager import load_host_configs_bulk
+    from playbook_index_manager import PLAYBOOKS_DIR, refresh_index
+    from playbook_scheduler import load_group_dependencies
+    from role_lock_manager import LOCK_FILE, load_lock
+    ledger = ledger or load_ledger()
+    dependencies = load_group_dependencies()
+    index = refresh_index(PLAYBOOKS_DIR)
+    lock = load_lock(LOCK_FILE)
+    configs, errors = load_host_configs_bulk()
+    configs = {conf["host_alias"]: conf for conf in configs}
+    unreadable = {os.path.basename(host_file)[:-4] for host_file, _ in errors}
+
+    limits, fingerprints = {}, {}
+    for group in groups:
+        hosts = host_sets.get(group, [])
+        playbook = os.path.join(PLAYBOOKS_DIR, f"{group}.yml")
+        context = dependency_fingerprint(group, host_sets, configs, dependencies)
+        fingerprints[group] = host_fingerprints(playbook, hosts, configs, index, lock, context)
+        converged = ledger["groups"].get(group, {})
+        limits[group] = [h for h in hosts
+                         if force or h in unreadable
+                         or converged.get(h, {}).get("fingerprint") != fingerprints[group][h]]
+    return limits, fingerprints
+
+
+def successful_hosts(events_file, hosts, returncode):
+    """
+    Returns the hosts that finished the run without failures or unreachable
+    results, from the playbook_stats event. Without stats (e.g. the callback was
+    disabled), all hosts count as successful only if the run exited 0.
+    """
+    for event in reversed(read_events(events_file)):
+        if event.get("event") == "playbook_stats":
+            stats = event.get("hosts", {})
+            return [h for h in hosts
+                    if h in stats and not stats[h].get("failures") and not stats[h].get("unreachable")]
+    return list(hosts) if returncode == 0 else []
+
+
+def record_converged(group, hosts, fingerprints, ledger=None, ledger_file=LEDGER_FILE):
+    """Stores the fingerprints of hosts that converged successfully for group."""
+    if not hosts:
+        return
+    ledger = ledger or load_ledger(ledger_file)
+    converged = ledger["groups"].setdefault(group, {})
+    now = time.strftime("%Y-%m-%dT%H:%M:%S")
+    for host in hosts:
+        converged[host] = {"fingerprint": fingerprints[host], "converged_at": now}
+    save_ledger(ledger, ledger_file)
+
+
+def forget(hosts=None, ledger_file=LEDGER_FILE):
+    """Drops ledger entries for hosts (all entries if None), forcing their next run."""
+    ledger = load_ledger(ledger_file)
+    for converged in ledger["groups"].values():
+        for host in list(converged):
+            if hosts is None or host in hosts:
+                del converged[host]
+    save_ledger(ledger, ledger_file)
+
+
+if __name__ == "__main__":
+    from inventory_manager import inventory_groups
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    names = sys.argv[2:]
+    if command == "forget":
+        forget(names or None)
+        print(f"Forgot convergence state for {', '.join(names) if names else 'all hosts'}.")
+    elif command == "status":
+        host_sets = inventory_groups()
+        groups = names or list(host_sets)
+        limits, _ = plan_group_runs(groups, host_sets)
+        ledger = load_ledger()
+        for group in groups:
+            print(f"{group}:")
+            for host in host_sets.get(group, []):
+                entry = ledger["groups"].get(group, {}).get(host)
+                state = "changed" if host in limits[group] else "up to date"
+                since = f" (converged {entry['converged_at']})" if entry else " (never converged)"
+                print(f"  {host:<24} {state}{since}")
+    else:
+        print("Usage: convergence_manager.py status [group ...] | forget [host ...]")
+        sys.exit(1)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Ansible dynamic inventory built from the vaulted host_vars files.
+
+  dynamic_inventory.py --list [--refresh]   groups and _meta.hostvars as JSON
+  dynamic_inventory.py --host HOST          variables for one host
+
+The --list payload is cached in .cache/inventory.json and only rebuilt when a
+host_vars file or the schema changes (see inventory_manager.build_inventory()).
+"""
+import json
+import os
+import sys
+
+# Ansible may start the script from another directory; paths are project relative.
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(PROJECT_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+from inventory_manager import build_inventory
+
+
+def main(argv):
+    payload, errors = build_inventory(refresh="--refresh" in argv)
+    for host_file, message in errors:
+        sys.stderr.write(f"Error decrypting {host_file}: {message}\n")
+
+    if "--host" in argv:
+        position = argv.index("--host") + 1
+        host = argv[position] if position < len(argv) else ""
+        print(json.dumps(payload["_meta"]["hostvars"].get(host, {})))
+    elif "--list" in argv:
+        print(json.dumps(payload, indent=2))
+    else:
+        sys.stderr.write("Usage: dynamic_inventory.py --list [--refresh] | --host HOST\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
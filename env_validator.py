@@ -1,45 +1,238 @@
+#!/usr/bin/env python3
+"""
+Validates the control machine before a run.
+
+Every probe runs concurrently. Successful tool and sudo results are cached in
+ENV_CACHE_FILE, keyed on what they depend on (the binary's path, mtime and size,
+the SUDO_ASKPASS program) and valid for ENV_CACHE_TTL seconds, so a normal run
+only re-probes what changed and doesn't fork sudo (or pop up an askpass prompt)
+every time. The Python package checks are cheap imports and always run.
+The results of the last validation are written to ENV_REPORT_FILE.
+
+  env_validator.py [--refresh] [--json]
+"""
+import json
 import os
+import re
 import shutil
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def validate_environment():
-    """Validates that required external dependencies, configurations, and roles are in place.
-    
-    Checks:
-      - sshpass is installed.
-      - SUDO_ASKPASS is defined and points to an executable file.
-      - PyYAML is installed.
-      - Sudo askpass functionality (via 'sudo -A ls -l /root') works.
-    """
-    missing = []
+ENV_CACHE_FILE = os.path.join(".cache", "environment.json")
+ENV_REPORT_FILE = os.path.join(".cache", "environment_report.json")
+ENV_CACHE_VERSION = 1
+# Successful probes are trusted this long even if nothing they depend on changed.
+ENV_CACHE_TTL = 86400
+# Tools the run executes, with the command printing their version.
+REQUIRED_TOOLS = {
+    "sshpass": ["sshpass", "-V"],
+    "ansible-playbook": ["ansible-playbook", "--version"],
+    "ansible-vault": ["ansible-vault", "--version"],
+    "ansible-galaxy": ["ansible-galaxy", "--version"],
+}
+# Oldest ansible-core the playbooks and the fact cache layout are known to work with.
+MIN_ANSIBLE_CORE = (2, 14)
+# Python packages the managers import: (import name, distribution name).
+REQUIRED_MODULES = [("yaml", "PyYAML"), ("cryptography", "cryptography")]
+PROBE_TIMEOUT = 30
 
-    # Check for sshpass
-    if shutil.which("sshpass") is None:
-        missing.append("sshpass")
+_VERSION_RE = re.compile(r"(\d+(?:\.\d+)+)")
+
+
+def _file_key(path):
+    """Returns [path, mtime_ns, size] for path, or [path] if it can't be read."""
+    try:
+        stat = os.stat(path)
+        return [path, stat.st_mtime_ns, stat.st_size]
+    except (OSError, TypeError):
+        return [path]
+
+
+def _parse_version(text):
+    match = _VERSION_RE.search(text or "")
+    return match.group(1) if match else None
 
-    # Check for SUDO_ASKPASS environment variable and executable file
-    sudo_askpass = os.environ.get("SUDO_ASKPASS")
-    if not sudo_askpass:
-        missing.append("SUDO_ASKPASS environment variable is not set")
-    else:
-        if not (os.path.exists(sudo_askpass) and os.access(sudo_askpass, os.X_OK)):
-            missing.append("SUDO_ASKPASS program is not found or not executable")
 
-    # Check for PyYAML installation
+def probe_tool(name, command):
+    """Runs a tool's version command; fails if the tool is missing or too old."""
+    path = shutil.which(command[0])
+    if path is None:
+        return {"ok": False, "detail": f"{command[0]} is not installed or not on PATH"}
     try:
-        import yaml  # noqa: F401
-    except ImportError:
-        missing.append("PyYAML (pip install pyyaml)")
+        # Ansible refuses to start with non-blocking stdio, so give it a plain stdin.
+        result = subprocess.run([path] + command[1:], stdin=subprocess.DEVNULL, capture_output=True,
+                                text=True, timeout=PROBE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return {"ok": False, "detail": f"{path}: {e}"}
+    output = result.stdout or result.stderr
+    version = _parse_version(output.splitlines()[0] if output else "")
+    if result.returncode != 0 or version is None:
+        return {"ok": False, "detail": f"'{' '.join([path] + command[1:])}' failed: {output.strip()[:200]}"}
+    if name.startswith("ansible-"):
+        core = tuple(int(part) for part in version.split(".")[:2])
+        if core < MIN_ANSIBLE_CORE:
+            minimum = ".".join(map(str, MIN_ANSIBLE_CORE))
+            return {"ok": False, "version": version, "detail": f"ansible-core {version} is older than {minimum}"}
+    return {"ok": True, "version": version, "detail": path}
 
-    # Test that "sudo -A ls -l /root" works.
-    result = subprocess.run(["sudo", "-A", "ls", "-l", "/root"],
-                            capture_output=True, text=True)
+
+def probe_module(module, distribution):
+    """Checks that a Python package can be imported and reports its version."""
+    try:
+        __import__(module)
+    except ImportError as e:
+        return {"ok": False, "detail": f"{e} (pip install {distribution})"}
+    from importlib import metadata
+    try:
+        version = metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        version = None
+    return {"ok": True, "version": version, "detail": module}
+
+
+def probe_askpass(askpass):
+    if not askpass:
+        return {"ok": False, "detail": "SUDO_ASKPASS environment variable is not set"}
+    if not (os.path.exists(askpass) and os.access(askpass, os.X_OK)):
+        return {"ok": False, "detail": f"SUDO_ASKPASS program {askpass} is not found or not executable"}
+    return {"ok": True, "detail": askpass}
+
+
+def probe_sudo(askpass):
+    """Runs 'sudo -A true' (may prompt through SUDO_ASKPASS)."""
+    if shutil.which("sudo") is None:
+        return {"ok": False, "detail": "sudo is not installed"}
+    if not askpass:
+        return {"ok": False, "detail": "skipped: SUDO_ASKPASS is not set"}
+    try:
+        result = subprocess.run(["sudo", "-A", "true"], stdin=subprocess.DEVNULL, capture_output=True,
+                                text=True, timeout=PROBE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return {"ok": False, "detail": str(e)}
     if result.returncode != 0:
-        print("ERROR: 'sudo -A ls -l /root' is not working properly. Please check your SUDO_ASKPASS setup and sudoers configuration.")
+        return {"ok": False, "detail": "'sudo -A true' failed; check your SUDO_ASKPASS setup and sudoers "
+                                       f"configuration ({result.stderr.strip()[:200]})"}
+    return {"ok": True, "detail": "sudo -A works"}
+
+
+def probes():
+    """Returns {name: (cache key, callable)} for everything the run needs; None keys are never cached."""
+    askpass = os.environ.get("SUDO_ASKPASS")
+    checks = {}
+    for name, command in REQUIRED_TOOLS.items():
+        checks[name] = (_file_key(shutil.which(command[0])), lambda n=name, c=command: probe_tool(n, c))
+    for module, distribution in REQUIRED_MODULES:
+        # Cheap in-process checks, and a package can go away without anything a key could see.
+        checks[distribution] = (None, lambda m=module, d=distribution: probe_module(m, d))
+    checks["SUDO_ASKPASS"] = (_file_key(askpass), lambda: probe_askpass(askpass))
+    checks["sudo"] = (_file_key(shutil.which("sudo")) + _file_key(askpass), lambda: probe_sudo(askpass))
+    return checks
+
+
+def load_cache(cache_file=ENV_CACHE_FILE):
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        if cache.get("version") == ENV_CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"version": ENV_CACHE_VERSION, "probes": {}}
+
+
+def _write_json(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_name = f"{path}.{os.getpid()}.tmp"
+    with open(temp_name, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(temp_name, path)
+
+
+def run_checks(refresh=False, cache_file=ENV_CACHE_FILE, report_file=ENV_REPORT_FILE, now=None):
+    """
+    Runs the uncached probes and every probe whose cached success is missing,
+    expired or keyed on something that changed (all of them when refresh is True),
+    concurrently, and writes the report to report_file. Returns the report:
+    {"ok", "checked_at", "probes": {name: result}} where each result has ok,
+    detail, version (when known), cached and duration_s.
+    """
+    now = now or time.time()
+    cache = load_cache(cache_file)
+    checks = probes()
+    results = {}
+    pending = {}
+    for name, (key, probe) in checks.items():
+        entry = cache["probes"].get(name)
+        if (not refresh and key is not None and entry and entry["key"] == key
+                and now - entry["checked_at"] < ENV_CACHE_TTL):
+            results[name] = dict(entry["result"], cached=True, duration_s=0.0)
+        else:
+            pending[name] = probe
+
+    def timed(item):
+        name, probe = item
+        start = time.perf_counter()
+        result = probe()
+        return name, dict(result, cached=False, duration_s=round(time.perf_counter() - start, 3))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            for name, result in executor.map(timed, pending.items()):
+                results[name] = result
+                if result["ok"] and checks[name][0] is not None:
+                    stored = {k: v for k, v in result.items() if k not in ("cached", "duration_s")}
+                    cache["probes"][name] = {"key": checks[name][0], "checked_at": now, "result": stored}
+                else:
+                    cache["probes"].pop(name, None)
+        _write_json(cache, cache_file)
+
+    report = {
+        "ok": all(result["ok"] for result in results.values()),
+        "checked_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now)),
+        "probes": {name: results[name] for name in checks},
+    }
+    _write_json(report, report_file)
+    return report
+
+
+def print_report(report):
+    width = max(len(name) for name in report["probes"])
+    for name, result in report["probes"].items():
+        state = " ".join(filter(None, ["ok" if result["ok"] else "FAILED", result.get("version"),
+                                       "(cached)" if result["cached"] else None]))
+        print(f"  {name:<{width}}  {state:<24}  {result['detail']}")
+
+
+def validate_environment(refresh=False):
+    """Validates that required external dependencies, configurations, and roles are in place.
+
+    Checks, concurrently and reusing cached successes (see run_checks()):
+      - sshpass, ansible-playbook, ansible-vault and ansible-galaxy are installed,
+        with ansible-core at least MIN_ANSIBLE_CORE.
+      - SUDO_ASKPASS is defined and points to an executable file.
+      - PyYAML and cryptography are installed.
+      - Sudo askpass functionality (via 'sudo -A true') works.
+    Exits when any check fails; returns the report otherwise.
+    """
+    report = run_checks(refresh=refresh)
+    if not report["ok"]:
+        print("ERROR: Environment validation failed:")
+        print_report(report)
+        print(f"Report written to {ENV_REPORT_FILE}.")
         sys.exit(1)
 
-    print("Environment validation passed: All required dependencies, configurations, and roles are in place.")
+    cached = sum(1 for result in report["probes"].values() if result["cached"])
+    print(f"Environment validation passed: All required dependencies, configurations, and roles are in place "
+          f"({cached}/{len(report['probes'])} checks cached).")
+    return report
+
 
 if __name__ == "__main__":
-    validate_environment()
+    report = run_checks(refresh="--refresh" in sys.argv)
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print_report(report)
+    sys.exit(0 if report["ok"] else 1)
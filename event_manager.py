@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import bisect
+import json
+import os
+import sys
+import time
+
+# Where per-run event streams written by callback_plugins/json_events.py are kept.
+EVENTS_DIR = os.path.join(".cache", "events")
+# Upper bounds (seconds) of the duration histogram buckets; the last bucket is open ended.
+HISTOGRAM_BOUNDS = [0.5, 1, 2, 5, 10, 30, 60, 120, 300]
+SLOWEST_COUNT = 20
+
+
+def new_events_file(label):
+    """Returns a fresh events file path for a run labelled label (e.g. the group name)."""
+    os.makedirs(EVENTS_DIR, exist_ok=True)
+    return os.path.join(EVENTS_DIR, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+
+
+def events_env(events_file, env=None):
+    """Returns a copy of env (default os.environ) telling the json_events callback where to write."""
+    env = dict(os.environ if env is None else env)
+    env["ANSIBLE_JSON_EVENTS_FILE"] = os.path.abspath(events_file)
+    return env
+
+
+def read_events(events_file):
+    """Returns the list of events in events_file, skipping lines that are not valid JSON."""
+    events = []
+    if not os.path.exists(events_file):
+        return events
+    with open(events_file, "r") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+def host_task_durations(events):
+    """
+    Pairs runner_start/runner_finish events and returns one record per host and task:
+    {"task", "task_uuid", "host", "status", "duration"}. When a runner_start is missing
+    (older Ansible), the task_start time is used instead.
+    """
+    task_started = {}
+    runner_started = {}
+    records = []
+    for event in events:
+        kind = event.get("event")
+        if kind == "task_start":
+            task_started[event["task_uuid"]] = event["time"]
+        elif kind == "runner_start":
+            runner_started[(event["task_uuid"], event["host"])] = event["time"]
+        elif kind == "runner_finish":
+            key = (event["task_uuid"], event["host"])
+            start = runner_started.pop(key, task_started.get(event["task_uuid"]))
+            if start is None:
+                continue
+            records.append({
+                "task": event["task"],
+                "task_uuid": event["task_uuid"],
+                "host": event["host"],
+                "status": event["status"],
+                "duration": max(0.0, event["time"] - start),
+            })
+    return records
+
+
+def histogram(durations):
+    """Returns bucket counts for durations, one per HISTOGRAM_BOUNDS entry plus an overflow bucket."""
+    counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    for duration in durations:
+        counts[bisect.bisect_left(HISTOGRAM_BOUNDS, duration)] += 1
+    return counts
+
+
+def summarize(records):
+    """
+    Aggregates host/task records into per-task and per-host statistics.
+    Returns {"tasks": {task_uuid: stats}, "hosts": {host: stats}}, where stats holds
+    name, count, total, max and histogram.
+    """
+    def add(table, key, name, duration):
+        stats = table.setdefault(key, {"name": name, "durations": []})
+        stats["durations"].append(duration)
+
+    tasks, hosts = {}, {}
+    for record in records:
+        add(tasks, record["task_uuid"], record["task"], record["duration"])
+        add(hosts, record["host"], record["host"], record["duration"])
+
+    def finish(table):
+        for stats in table.values():
+            durations = stats.pop("durations")
+            stats.update(count=len(durations), total=sum(durations), max=max(durations),
+                         histogram=histogram(durations))
+        return table
+
+    return {"tasks": finish(tasks), "hosts": finish(hosts)}
+
+
+def _histogram_header():
+    labels = [f"<={bound:g}s" for bound in HISTOGRAM_BOUNDS] + [f">{HISTOGRAM_BOUNDS[-1]:g}s"]
+    return " ".join(f"{label:>7}" for label in labels)
+
+
+def _histogram_row(counts):
+    return " ".join(f"{count:>7}" for count in counts)
+
+
+def print_run_report(events_file, label=None, limit=SLOWEST_COUNT):
+    """Prints the slowest tasks and the per-host duration histograms for one run."""
+    records = host_task_durations(read_events(events_file))
+    title = f" for '{label}'" if label else ""
+    if not records:
+        print(f"\nNo task timing events recorded{title} ({events_file}).")
+        return None
+    summary = summarize(records)
+
+    print(f"\nSlowest {limit} tasks{title} (wall time of the slowest host):")
+    slowest = sorted(summary["tasks"].values(), key=lambda s: s["max"], reverse=True)[:limit]
+    width = max(len(s["name"]) for s in slowest)
+    print(f"{'Task':<{width}}  {'max (s)':>8}  {'total (s)':>9}  {'hosts':>5}  {_histogram_header()}")
+    for stats in slowest:
+        print(f"{stats['name']:<{width}}  {stats['max']:>8.2f}  {stats['total']:>9.2f}  {stats['count']:>5}  "
+              f"{_histogram_row(stats['histogram'])}")
+
+    print(f"\nPer-host task duration histogram{title}:")
+    width = max(len("all tasks"), *(len(h) for h in summary["hosts"]))
+    print(f"{'Host':<{width}}  {'total (s)':>9}  {_histogram_header()}")
+    for host, stats in sorted(summary["hosts"].items()):
+        print(f"{host:<{width}}  {stats['total']:>9.2f}  {_histogram_row(stats['histogram'])}")
+
+    print(f"\nTask duration histogram across hosts{title}:")
+    print(f"{'':<{width}}  {'':>9}  {_histogram_header()}")
+    print(f"{'all tasks':<{width}}  {sum(s['total'] for s in summary['hosts'].values()):>9.2f}  "
+          f"{_histogram_row(histogram([r['duration'] for r in records]))}")
+    return summary
+
+
+if __name__ == "__main__":
+    # Usage: event_manager.py [events.jsonl ...]; defaults to the most recent run.
+    files = sys.argv[1:]
+    if not files and os.path.isdir(EVENTS_DIR):
+        candidates = sorted((os.path.join(EVENTS_DIR, f) for f in os.listdir(EVENTS_DIR)), key=os.path.getmtime)
+        files = candidates[-1:]
+    if not files:
+        print("No event files found.")
+    for events_file in files:
+        print_run_report(events_file, label=os.path.basename(events_file))
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Project fact cache (jsonfile plugin, see ansible.cfg).
+
+With gathering = smart, playbooks only gather facts for hosts missing from the
+cache, so a warm cache lets docker_hosts.yml start on the first task straight away.
+
+  fact_cache_manager.py status [host ...]        cache age per host and hit rate
+  fact_cache_manager.py prewarm [--all] [host ...] gather missing/stale facts concurrently
+  fact_cache_manager.py invalidate [host ...]    drop cached facts (all hosts if none given)
+
+Playbook tasks that change facts (e.g. sysctl settings) notify the
+"Clear cached facts" handler, which invalidates the changed host only.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from inventory_manager import INVENTORY_SCRIPT, inventory_groups
+
+# Keep in step with fact_caching_connection / fact_caching_timeout in ansible.cfg.
+FACT_CACHE_DIR = os.path.join(".cache", "facts")
+FACT_CACHE_TIMEOUT = 86400
+# Cumulative hit/miss counters across runs.
+STATS_FILE = os.path.join(".cache", "fact_cache_stats.json")
+# ansible-core 2.19+ prefixes cache keys with a schema id ("s1_<host>"); older
+# releases use the bare host name.
+_SCHEMA_PREFIX_RE = re.compile(r"^s\d+_")
+# Actions of the implicit "Gathering Facts" task and explicit fact gathering.
+GATHER_ACTIONS = {"gather_facts", "ansible.builtin.gather_facts", "setup", "ansible.builtin.setup"}
+
+
+def all_hosts():
+    """Returns every inventory host, in inventory order."""
+    hosts = []
+    for members in inventory_groups().values():
+        hosts += [h for h in members if h not in hosts]
+    return hosts
+
+
+def cache_files():
+    """Returns {host: [cache file paths]} for everything in FACT_CACHE_DIR."""
+    files = {}
+    if os.path.isdir(FACT_CACHE_DIR):
+        for name in os.listdir(FACT_CACHE_DIR):
+            if not name.startswith("."):
+                host = _SCHEMA_PREFIX_RE.sub("", name, count=1)
+                files.setdefault(host, []).append(os.path.join(FACT_CACHE_DIR, name))
+    return files
+
+
+def cache_status(hosts, now=None):
+    """
+    Returns {host: age in seconds} for hosts with fresh cached facts, and None for
+    hosts with no or expired facts (which the next play will gather).
+    """
+    now = now or time.time()
+    files = cache_files()
+    status = {}
+    for host in hosts:
+        ages = []
+        for path in files.get(host, []):
+            try:
+                ages.append(now - os.path.getmtime(path))
+            except OSError:
+                pass
+        age = min(ages) if ages else None
+        status[host] = age if age is not None and age < FACT_CACHE_TIMEOUT else None
+    return status
+
+
+def load_stats(stats_file=STATS_FILE):
+    if not os.path.exists(stats_file):
+        return {"hits": 0, "misses": 0}
+    with open(stats_file, "r") as f:
+        return json.load(f)
+
+
+def record_fact_cache_hits(events_file, label=None, stats_file=STATS_FILE):
+    """
+    Counts, from a finished run's event stream (see event_manager.py), the hosts that
+    were served from the fact cache: with gathering = smart, only hosts missing from
+    the cache run the fact gathering task. Prints the run's hit rate, adds it to the
+    cumulative counters and returns (hits, misses).
+    """
+    from event_manager import read_events
+
+    events = read_events(events_file)
+    hosts = set()
+    gathered = set()
+    for event in events:
+        if event.get("event") == "playbook_stats":
+            hosts.update(event.get("hosts", {}))
+        elif event.get("event") == "runner_finish" and event.get("action") in GATHER_ACTIONS:
+            gathered.add(event["host"])
+    hosts |= gathered
+    if not hosts:
+        return 0, 0
+    misses = len(gathered)
+    hits = len(hosts) - misses
+    stats = load_stats(stats_file)
+    stats["hits"] += hits
+    stats["misses"] += misses
+    os.makedirs(os.path.dirname(stats_file) or ".", exist_ok=True)
+    with open(stats_file, "w") as f:
+        json.dump(stats, f)
+
+    title = f" for '{label}'" if label else ""
+    total = stats["hits"] + stats["misses"]
+    print(f"Fact cache{title}: {hits}/{len(hosts)} host(s) served from the cache ({hits / len(hosts):.0%}); "
+          f"all runs: {stats['hits']}/{total} ({stats['hits'] / total:.0%})")
+    return hits, misses
+
+
+def prewarm(hosts=None, refresh_all=False, forks=None):
+    """
+    Gathers facts for hosts (default: every inventory host) with one concurrent
+    ansible run (forks from the global fork budget). Hosts with fresh cached facts
+    are skipped unless refresh_all is True. Returns the ansible exit code, or 0
+    when there was nothing to do.
+    """
+    from playbook_scheduler import get_fork_budget
+    from ssh_mux_manager import ansible_env
+
+    hosts = hosts or all_hosts()
+    if not refresh_all:
+        hosts = [h for h, age in cache_status(hosts).items() if age is None]
+    if not hosts:
+        print("Fact cache is warm; nothing to gather.")
+        return 0
+
+    forks = min(get_fork_budget(forks), len(hosts))
+    print(f"Gathering facts for {len(hosts)} host(s) with {forks} fork(s)...")
+    command = ["ansible", "all", "-i", INVENTORY_SCRIPT, "--limit", ",".join(hosts),
+               "-m", "ansible.builtin.setup", "--forks", str(forks)]
+    result = subprocess.run(command, env=ansible_env(), stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL)
+    cached = sum(1 for age in cache_status(hosts).values() if age is not None)
+    print(f"Facts cached for {cached}/{len(hosts)} host(s).")
+    return result.returncode
+
+
+def invalidate(hosts=None):
+    """Removes the cached facts of hosts (every cached host if None). Returns the hosts removed."""
+    files = cache_files()
+    hosts = hosts or sorted(files)
+    removed = []
+    for host in hosts:
+        for path in files.get(host, []):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            if host not in removed:
+                removed.append(host)
+    return removed
+
+
+def print_status(hosts=None):
+    hosts = hosts or all_hosts()
+    status = cache_status(hosts)
+    width = max([len("Host")] + [len(h) for h in hosts])
+    print(f"{'Host':<{width}}  Cached facts")
+    for host, age in status.items():
+        print(f"{host:<{width}}  {'missing or expired' if age is None else f'{age / 60:.0f} min old'}")
+    hits = sum(1 for age in status.values() if age is not None)
+    print(f"\n{hits}/{len(status)} host(s) cached.")
+    stats = load_stats()
+    total = stats["hits"] + stats["misses"]
+    if total:
+        print(f"Hit rate over all playbook runs: {stats['hits']}/{total} ({stats['hits'] / total:.0%})")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    names = [a for a in sys.argv[2:] if not a.startswith("--")]
+    if command == "prewarm":
+        sys.exit(prewarm(names, refresh_all="--all" in sys.argv))
+    elif command == "invalidate":
+        removed = invalidate(names)
+        print(f"Invalidated cached facts for {len(removed)} host(s).")
+    elif command == "status":
+        print_status(names)
+    else:
+        print("Usage: fact_cache_manager.py status|prewarm [--all]|invalidate [host ...]")
+        sys.exit(1)
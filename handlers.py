@@ -126,6 +126,83 @@ def edit_embedded_file(current, default, full_name):
     # Return exactly: {{ lookup('file', '/path/to/file') }}
     return f"{{{{ lookup('file', '{user_input}') }}}}"
 
+# Non-interactive counterparts of the handlers above, used for bulk imports.
+# Each takes a raw manifest value (None/"" when absent) and the schema default,
+# applies the same semantics as its interactive handler and raises ValueError
+# for values it cannot accept. The name is the handler name with "edit_"
+# replaced by "normalize_".
+
+def normalize_string(value, default):
+    """Returns the value as a stripped string, or the default when it is empty."""
+    if value is None or str(value).strip() == "":
+        return default
+    return str(value).strip()
+
+def normalize_string_list(value, default):
+    """
+    Accepts a list or a string of items separated by ';' or ','.
+    Returns a list of strings, or the default when there are no items.
+    """
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = value.replace(";", ",").split(",")
+    if not isinstance(value, list):
+        raise ValueError(f"expected a list, got {type(value).__name__}")
+    items = [str(item).strip() for item in value if str(item).strip()]
+    return items if items else default
+
+def normalize_peer_list(value, default):
+    """
+    Accepts a list of peer dictionaries (public_key, allowed_ips, endpoint), or a
+    string of peers separated by ';' with the fields of each separated by '|':
+      "<public_key>|<ip>,<ip>|<endpoint>; ..."
+    allowed_ips may be a list or a comma-separated string. Returns the list of peers.
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        peers = []
+        for chunk in value.split(";"):
+            if not chunk.strip():
+                continue
+            fields = [field.strip() for field in chunk.split("|")] + ["", ""]
+            peers.append({"public_key": fields[0], "allowed_ips": fields[1], "endpoint": fields[2]})
+        value = peers
+    if not isinstance(value, list):
+        raise ValueError(f"expected a list of peers, got {type(value).__name__}")
+    result = []
+    for number, peer in enumerate(value, start=1):
+        if not isinstance(peer, dict):
+            raise ValueError(f"peer {number} is not a mapping")
+        public_key = str(peer.get("public_key") or "").strip()
+        if not public_key:
+            raise ValueError(f"peer {number} has no public_key")
+        allowed_ips = peer.get("allowed_ips") or []
+        if isinstance(allowed_ips, str):
+            allowed_ips = allowed_ips.split(",")
+        result.append({
+            "public_key": public_key,
+            "allowed_ips": [str(ip).strip() for ip in allowed_ips if str(ip).strip()],
+            "endpoint": str(peer.get("endpoint") or "").strip(),
+        })
+    return result
+
+def normalize_embedded_file(value, default):
+    """
+    Accepts a file path (or an already wrapped lookup) and returns it embedded as
+      {{ lookup('file', '/path/to/file') }}
+    using the default path when the value is empty.
+    """
+    prefix = "{{ lookup('file', '"
+    suffix = "') }}"
+    path = normalize_string(value, default)
+    if path.startswith(prefix) and path.endswith(suffix):
+        return path
+    if "'" in path:
+        raise ValueError("file path must not contain a single quote")
+    return f"{prefix}{path}{suffix}"
+
 
 if __name__ == "__main__":
     # Test the edit_embedded_file handler from the command line.
@@ -2,31 +2,133 @@ import os
 import subprocess
 
 HOSTS_FILE = "/etc/hosts"
+# Entries written by update_hosts_files() live between these markers.
+BLOCK_BEGIN = "# BEGIN preAnsible managed hosts"
+BLOCK_END = "# END preAnsible managed hosts"
 
-def update_hosts_file(target):
-    """Adds the target alias to /etc/hosts if not already present using sudo -A and tee."""
-    entry = f"{target['host_ip_or_name']} {target['host_alias']}\n"
+# Replaces the hosts file in one step: the new content arrives on stdin, is written
+# next to the target and renamed over it. Where the file can't be renamed over
+# (e.g. /etc/hosts bind-mounted into a container) it is rewritten in place instead.
+_WRITE_SCRIPT = (
+    'set -e; tmp=$(mktemp "$1.XXXXXX"); cat > "$tmp"; chmod 644 "$tmp"; '
+    'mv -f "$tmp" "$1" 2>/dev/null || { cat "$tmp" > "$1"; rm -f "$tmp"; }'
+)
 
-    # Read /etc/hosts (which is typically world-readable)
+def parse_hosts(content):
+    """
+    Splits hosts file content into the lines outside the managed block and the
+    managed entries. Returns (outside_lines, managed), where managed maps each
+    alias to its IP in block order, and outside_lines keeps the other lines as is.
+    """
+    outside, managed = [], {}
+    in_block = False
+    for line in content.splitlines():
+        stripped = line.strip()
+        if stripped == BLOCK_BEGIN:
+            in_block = True
+            continue
+        if stripped == BLOCK_END:
+            in_block = False
+            continue
+        if in_block:
+            fields = stripped.split("#", 1)[0].split()
+            for name in fields[1:]:
+                managed[name] = fields[0]
+        else:
+            outside.append(line)
+    return outside, managed
+
+def index_names(lines):
+    """Returns {name: [(line number, ip), ...]} for the hostnames on the given lines."""
+    index = {}
+    for number, line in enumerate(lines):
+        fields = line.split("#", 1)[0].split()
+        for name in fields[1:]:
+            index.setdefault(name, []).append((number, fields[0]))
+    return index
+
+def plan_hosts_update(content, targets):
+    """
+    Computes the hosts file content with every target in the managed block.
+    Returns (new_content, changes); changes is a list of (alias, old_ip, new_ip)
+    tuples, old_ip being None for additions. new_content equals content when
+    nothing changed.
+
+    Lines outside the block of the form "<ip> <alias>" for a target (what the
+    previous append-only writer left behind) are moved into the block. Other
+    lines naming a target are left alone and reported.
+    """
+    outside, managed = parse_hosts(content)
+    index = index_names(outside)
+    adopted = set()
+    changes = []
+
+    for target in targets:
+        alias, ip = target["host_alias"], target["host_ip_or_name"]
+        for number, other_ip in index.get(alias, []):
+            if outside[number].split("#", 1)[0].split() == [other_ip, alias]:
+                adopted.add(number)
+                managed.setdefault(alias, other_ip)
+            else:
+                print(f"Note: {alias} also appears outside the managed hosts block: "
+                      f"{outside[number].strip()}")
+        old_ip = managed.get(alias)
+        if old_ip != ip:
+            changes.append((alias, old_ip, ip))
+            managed[alias] = ip
+
+    if not changes and not adopted:
+        return content, changes
+
+    kept = [line for number, line in enumerate(outside) if number not in adopted]
+    while kept and not kept[-1].strip():
+        kept.pop()
+    lines = kept + ["", BLOCK_BEGIN] + [f"{ip} {alias}" for alias, ip in managed.items()] + [BLOCK_END]
+    return "\n".join(lines) + "\n", changes
+
+def write_hosts_file(content, hosts_file=HOSTS_FILE):
+    """Replaces hosts_file with content using a single sudo -A call. Returns True on success."""
     try:
-        with open(HOSTS_FILE, "r") as hosts_file:
-            hosts = hosts_file.read()
-    except Exception as e:
-        print("ERROR reading /etc/hosts:", e)
-        return
+        result = subprocess.run(["sudo", "-A", "sh", "-c", _WRITE_SCRIPT, "sh", hosts_file],
+                                input=content, capture_output=True, text=True)
+    except OSError as e:
+        print(f"Exception while updating {hosts_file}:", e)
+        return False
+    if result.returncode != 0:
+        print(f"ERROR updating {hosts_file}:", result.stderr.strip())
+        return False
+    return True
 
-    if entry.strip() in hosts:
-        print(f"{target['host_alias']} is already in {HOSTS_FILE}. Skipping update.")
-        return
+def update_hosts_files(targets, hosts_file=HOSTS_FILE):
+    """
+    Adds or updates the alias of every target in the managed block of hosts_file.
+    All changes are applied in one privileged write; when nothing changed, sudo is
+    not called at all. Returns the list of (alias, old_ip, new_ip) changes applied.
+    """
+    if isinstance(targets, dict):
+        targets = list(targets.values())
 
-    # Use sudo -A and tee to append the entry to /etc/hosts
+    # Read /etc/hosts (which is typically world-readable)
     try:
-        # The command echoes the entry and pipes it to sudo -A tee -a /etc/hosts
-        cmd = f'echo "{entry.strip()}" | sudo -A tee -a {HOSTS_FILE}'
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
-            print(f"Added {target['host_alias']} to {HOSTS_FILE}")
+        with open(hosts_file, "r") as f:
+            content = f.read()
+    except OSError as e:
+        print(f"ERROR reading {hosts_file}:", e)
+        return []
+
+    new_content, changes = plan_hosts_update(content, targets)
+    if new_content == content:
+        print(f"{hosts_file} is up to date for {len(targets)} host(s).")
+        return []
+    if not write_hosts_file(new_content, hosts_file):
+        return []
+    for alias, old_ip, new_ip in changes:
+        if old_ip is None:
+            print(f"Added {alias} ({new_ip}) to {hosts_file}")
         else:
-            print("ERROR updating /etc/hosts:", result.stderr)
-    except Exception as e:
-        print("Exception while updating /etc/hosts:", e)
+            print(f"Updated {alias} in {hosts_file}: {old_ip} -> {new_ip}")
+    return changes
+
+def update_hosts_file(target):
+    """Adds or updates a single target in /etc/hosts; see update_hosts_files()."""
+    return update_hosts_files([target])
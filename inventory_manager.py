@@ -2,80 +2,148 @@
 import json
 import os
 
-def generate_inventory():
+# Cached output of build_inventory(); holds connection settings only, never vault secrets.
+INVENTORY_CACHE_FILE = os.path.join(".cache", "inventory.json")
+# Executable inventory script referenced by ansible.cfg.
+INVENTORY_SCRIPT = "dynamic_inventory.py"
+# Group used for hosts whose configuration has no inventory_groups entry.
+DEFAULT_GROUP = "docker_hosts"
+# Keep in step with the inventory payload layout; bumping it invalidates old caches.
+INVENTORY_CACHE_VERSION = 1
+
+def host_vars_signature(host_vars_dir=None):
     """
-    Reads the setup_config.json file from the current directory,
-    groups targets by their 'group' value, and writes an inventory.ini file.
-    
-    Expected JSON structure:
-    {
-        "targets": [
-            {
-                "host_alias": "erptst",
-                "host_ip_or_name": "192.168.122.172",
-                "ssh_user": "you",
-                "ssh_port": "22",
-                "identity_file": "id_rsa",
-                "group": "docker_hosts"
-            },
-            {
-                "host_alias": "erp1st",
-                "host_ip_or_name": "192.168.122.131",
-                "ssh_user": "joe",
-                "ssh_port": "22",
-                "identity_file": "id_rsa",
-                "group": "controllers"
-            },
-            {
-                "host_alias": "erp2nd",
-                "host_ip_or_name": "192.168.122.131",
-                "ssh_user": "boss",
-                "ssh_port": "22",
-                "identity_file": "id_rsa",
-                "group": "docker_hosts"
-            }
-        ]
-    }
+    Returns {file name: [mtime_ns, size]} for every host file, plus the schema file.
+    The cached inventory is reused only while this signature is unchanged.
     """
-    config_file = "setup_config.json"
-    inventory_file = "inventory.ini"
-    
-    if not os.path.exists(config_file):
-        print(f"Error: {config_file} not found in the current directory.")
-        return
-    
-    with open(config_file, "r") as f:
-        config = json.load(f)
-    
-    targets = config.get("targets", [])
-    if not targets:
-        print("No targets found in configuration.")
-        return
-    
-    # Group targets by the 'group' key.
+    from config_manager import HOST_VARS_DIR, SCHEMA_FILE
+    host_vars_dir = host_vars_dir or HOST_VARS_DIR
+    signature = {}
+    if os.path.isdir(host_vars_dir):
+        for name in sorted(os.listdir(host_vars_dir)):
+            if name.endswith(".yml"):
+                stat = os.stat(os.path.join(host_vars_dir, name))
+                signature[name] = [stat.st_mtime_ns, stat.st_size]
+    if os.path.exists(SCHEMA_FILE):
+        stat = os.stat(SCHEMA_FILE)
+        signature[SCHEMA_FILE] = [stat.st_mtime_ns, stat.st_size]
+    return signature
+
+def inventory_from_configs(configs):
+    """
+    Builds an Ansible dynamic inventory payload from host configuration dictionaries:
+    {"<group>": {"hosts": [...]}, ..., "_meta": {"hostvars": {...}}}.
+    Hosts join the groups listed in their inventory_groups field (DEFAULT_GROUP if
+    empty). Only connection variables go into hostvars; everything else is still read
+    by Ansible from the vaulted host_vars files.
+    Returns (payload, errors); hosts with an invalid ssh_port are left out and
+    reported in errors as (host_file, message) tuples.
+    """
+    from config_manager import HOST_VARS_DIR
     groups = {}
-    for target in targets:
-        group = target.get("group", "ungrouped")
-        groups.setdefault(group, []).append(target)
-    
-    # Build the inventory file content.
+    hostvars = {}
+    errors = []
+    for conf in configs:
+        alias = conf.get("host_alias")
+        if not alias:
+            continue
+        try:
+            port = int(conf.get("ssh_port") or 22)
+            if not 1 <= port <= 65535:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append((os.path.join(HOST_VARS_DIR, f"{alias}.yml"),
+                           f"invalid ssh_port {conf.get('ssh_port')!r}; host left out of the inventory"))
+            continue
+        for group in conf.get("inventory_groups") or [DEFAULT_GROUP]:
+            groups.setdefault(group, {"hosts": []})["hosts"].append(alias)
+        hostvars[alias] = {
+            "ansible_host": conf.get("host_ip_or_name", alias),
+            "ansible_user": conf.get("ssh_user", ""),
+            "ansible_port": port,
+            "ansible_become": True,
+        }
+    payload = dict(sorted(groups.items()))
+    payload["_meta"] = {"hostvars": hostvars}
+    return payload, errors
+
+def load_inventory_cache(cache_file=INVENTORY_CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("version") != INVENTORY_CACHE_VERSION:
+        return None
+    return cache
+
+def save_inventory_cache(cache, cache_file=INVENTORY_CACHE_FILE):
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    temp_name = f"{cache_file}.{os.getpid()}.tmp"
+    with open(temp_name, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(temp_name, cache_file)
+
+def build_inventory(refresh=False, cache_file=INVENTORY_CACHE_FILE):
+    """
+    Returns the dynamic inventory payload for the host configs in HOST_VARS_DIR.
+    The payload is cached in cache_file and rebuilt only when a host file or the
+    schema changed (see host_vars_signature()), or when refresh is True, so
+    repeated Ansible invocations don't decrypt every host file again.
+    Returns (payload, errors), errors being (host_file, message) tuples; a build
+    with errors is not cached.
+    """
+    signature = host_vars_signature()
+    cache = None if refresh else load_inventory_cache(cache_file)
+    if cache and cache.get("signature") == signature:
+        return cache["inventory"], []
+
+    from config_manager import load_host_configs_bulk
+    configs, errors = load_host_configs_bulk()
+    payload, invalid = inventory_from_configs(configs)
+    errors += invalid
+    if not errors:
+        save_inventory_cache({"version": INVENTORY_CACHE_VERSION, "signature": signature,
+                              "inventory": payload}, cache_file)
+    return payload, errors
+
+def inventory_groups(payload=None):
+    """Returns {group: [hosts]} from a dynamic inventory payload (default: build_inventory())."""
+    if payload is None:
+        payload, errors = build_inventory()
+        for host_file, message in errors:
+            print(f"Error decrypting {host_file}: {message}")
+    return {group: list(data.get("hosts", [])) for group, data in payload.items() if group != "_meta"}
+
+def generate_inventory(inventory_file="inventory.ini"):
+    """
+    Writes a static INI snapshot of the dynamic inventory, for tools that can't run
+    the inventory script. Ansible itself uses INVENTORY_SCRIPT (see ansible.cfg).
+    """
+    payload, errors = build_inventory()
+    for host_file, message in errors:
+        print(f"Error decrypting {host_file}: {message}")
+    hostvars = payload["_meta"]["hostvars"]
+    groups = inventory_groups(payload)
+    if not groups:
+        print("No hosts found in host_vars.")
+        return
+
     inventory_lines = []
     for group, hosts in groups.items():
         inventory_lines.append(f"[{group}]")
         for host in hosts:
-            # Use host_alias as the inventory host entry.
-            # You could include ansible_host if desired, e.g.:
-            # f"{host['host_alias']} ansible_host={host['host_ip_or_name']} ansible_user={host['ssh_user']} ansible_become=true"
-            # But following your example:
-            line = f"{host['host_alias']} ansible_user={host['ssh_user']} ansible_become=true"
-            inventory_lines.append(line)
+            host_vars = hostvars[host]
+            inventory_lines.append(f"{host} ansible_host={host_vars['ansible_host']} "
+                                   f"ansible_user={host_vars['ansible_user']} "
+                                   f"ansible_port={host_vars['ansible_port']} ansible_become=true")
         inventory_lines.append("")  # blank line between groups
 
-    inventory_content = "\n".join(inventory_lines)
-    
     with open(inventory_file, "w") as f:
-        f.write(inventory_content)
-    
+        f.write("\n".join(inventory_lines))
+
     print(f"Inventory written to {inventory_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+WireGuard address management.
+
+Keeps one bitmap per WireGuard subnet of the addresses used in host_vars,
+persisted in IPAM_FILE together with the addresses of each host file and the
+file's mtime/size. Refreshing only decrypts host files that changed since the
+last refresh, and allocation takes the next free address from a cursor instead
+of scanning the fleet.
+
+  ipam_manager.py status            usage per subnet and duplicate addresses
+  ipam_manager.py next [SUBNET]     print the next free address
+"""
+import base64
+import ipaddress
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import config_manager
+from vault_codec import read_vault_password, VaultError
+
+IPAM_FILE = os.path.join(".cache", "ipam.json")
+IPAM_VERSION = 1
+# Host numbers below this are left for gateways and manual assignments; the old
+# schema default (10.8.0.101/24) was the first host address handed out.
+START_OFFSET = 101
+DEFAULT_SUBNET = "10.8.0.0/24"
+
+
+def default_subnet():
+    """Returns the subnet of the wireguard_addresses schema default, or DEFAULT_SUBNET."""
+    schema = config_manager.load_schema() if os.path.exists(config_manager.SCHEMA_FILE) else {}
+    for address in (schema.get("wireguard_addresses") or {}).get("default") or []:
+        try:
+            return str(ipaddress.ip_interface(address).network)
+        except ValueError:
+            continue
+    return DEFAULT_SUBNET
+
+
+def load_ipam(ipam_file=IPAM_FILE):
+    """Returns the persisted index: {"version", "files": {name: entry}, "subnets": {subnet: state}}."""
+    try:
+        with open(ipam_file, "r") as f:
+            index = json.load(f)
+        if index.get("version") == IPAM_VERSION:
+            for state in index["subnets"].values():
+                state["bitmap"] = bytearray(base64.b64decode(state["bitmap"]))
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return {"version": IPAM_VERSION, "files": {}, "subnets": {}}
+
+
+def save_ipam(index, ipam_file=IPAM_FILE):
+    """Atomically writes the index; bitmaps are stored base64 encoded."""
+    data = dict(index, subnets={
+        subnet: dict(state, bitmap=base64.b64encode(bytes(state["bitmap"])).decode("ascii"))
+        for subnet, state in index["subnets"].items()})
+    os.makedirs(os.path.dirname(ipam_file), exist_ok=True)
+    temp_name = f"{ipam_file}.{os.getpid()}.tmp"
+    with open(temp_name, "w") as f:
+        json.dump(data, f, sort_keys=True)
+    os.replace(temp_name, ipam_file)
+
+
+def _subnet_state(index, subnet):
+    network = ipaddress.ip_network(subnet)
+    state = index["subnets"].get(str(network))
+    if state is None:
+        size = min(network.num_addresses, 1 << 24)
+        state = {"bitmap": bytearray((size + 7) // 8), "cursor": START_OFFSET}
+        index["subnets"][str(network)] = state
+    return network, state
+
+
+def _set(bitmap, offset):
+    bitmap[offset >> 3] |= 1 << (offset & 7)
+
+
+def _is_set(bitmap, offset):
+    return bool(bitmap[offset >> 3] & (1 << (offset & 7)))
+
+
+def rebuild_bitmaps(index):
+    """Recomputes every subnet bitmap from the per-file addresses."""
+    for state in index["subnets"].values():
+        state["bitmap"] = bytearray(len(state["bitmap"]))
+    for entry in index["files"].values():
+        for address in entry["addresses"]:
+            try:
+                interface = ipaddress.ip_interface(address)
+            except ValueError:
+                continue
+            network, state = _subnet_state(index, interface.network)
+            offset = int(interface.ip) - int(network.network_address)
+            if offset < len(state["bitmap"]) * 8:
+                _set(state["bitmap"], offset)
+
+
+def refresh_ipam(host_vars_dir=None, ipam_file=IPAM_FILE):
+    """
+    Brings the index up to date with host_vars_dir, decrypting only files whose
+    mtime or size changed, and saves it when anything changed. Returns the index.
+    """
+    host_vars_dir = host_vars_dir or config_manager.HOST_VARS_DIR
+    index = load_ipam(ipam_file)
+    files = index["files"]
+    current = {}
+    if os.path.isdir(host_vars_dir):
+        for name in os.listdir(host_vars_dir):
+            if name.endswith(".yml"):
+                stat = os.stat(os.path.join(host_vars_dir, name))
+                current[name] = [stat.st_mtime_ns, stat.st_size]
+
+    changed = [name for name, signature in current.items() if files.get(name, {}).get("signature") != signature]
+    removed = [name for name in files if name not in current]
+    for name in removed:
+        del files[name]
+
+    if changed:
+        try:
+            password = read_vault_password(config_manager.VAULT_PASS_FILE)
+        except VaultError as e:
+            print(f"Cannot refresh the address index: {e}")
+            return index
+        jobs = [(os.path.join(host_vars_dir, name), password) for name in changed]
+        if len(jobs) < config_manager.PARALLEL_VAULT_THRESHOLD:
+            results = map(config_manager._decrypt_host_file, jobs)
+        else:
+            with ProcessPoolExecutor(max_workers=min(config_manager.available_cpus(), len(jobs))) as executor:
+                results = list(executor.map(config_manager._decrypt_host_file, jobs))
+        for host_file, data, error in results:
+            name = os.path.basename(host_file)
+            if error is not None:
+                print(f"Error decrypting {host_file}: {error}")
+                files.pop(name, None)
+                continue
+            files[name] = {
+                "signature": current[name],
+                "alias": data.get("host_alias") or name[:-4],
+                "addresses": [str(a) for a in data.get("wireguard_addresses") or []],
+            }
+
+    if changed or removed or not index["subnets"]:
+        rebuild_bitmaps(index)
+        save_ipam(index, ipam_file)
+    return index
+
+
+def owners(index):
+    """Returns {ip: [aliases using it]} across the fleet."""
+    used = {}
+    for entry in index["files"].values():
+        for address in entry["addresses"]:
+            try:
+                ip = str(ipaddress.ip_interface(address).ip)
+            except ValueError:
+                continue
+            used.setdefault(ip, []).append(entry["alias"])
+    return used
+
+
+def duplicates(index):
+    """Returns {ip: [aliases]} for addresses used by more than one host."""
+    return {ip: aliases for ip, aliases in sorted(owners(index).items()) if len(aliases) > 1}
+
+
+def reserve(index, address):
+    """Marks address as used in memory (e.g. for a host not saved yet)."""
+    interface = ipaddress.ip_interface(address)
+    network, state = _subnet_state(index, interface.network)
+    offset = int(interface.ip) - int(network.network_address)
+    if offset < len(state["bitmap"]) * 8:
+        _set(state["bitmap"], offset)
+
+
+def allocate(index, subnet=None):
+    """
+    Returns the next free address of subnet (default: the schema's subnet) in
+    interface form, e.g. "10.8.0.102/24", and marks it used in memory. The cursor
+    only moves forward, so allocating is constant time amortised; it wraps around
+    once to pick up addresses freed by removed hosts. Raises ValueError when the
+    subnet is full.
+    """
+    network, state = _subnet_state(index, subnet or default_subnet())
+    bitmap = state["bitmap"]
+    last = min(network.num_addresses, len(bitmap) * 8) - 1   # broadcast address excluded below
+    # Subnets too small for START_OFFSET hand out addresses from the first host on.
+    first = START_OFFSET if START_OFFSET < last else 1
+    for start, stop in ((max(state["cursor"], first), last), (first, last)):
+        for offset in range(start, stop):
+            if not _is_set(bitmap, offset):
+                _set(bitmap, offset)
+                state["cursor"] = offset + 1
+                return f"{network.network_address + offset}/{network.prefixlen}"
+    raise ValueError(f"no free addresses left in {network}")
+
+
+def assign_addresses(index, configs, allocate_for):
+    """
+    Checks the wireguard_addresses of configs against the fleet and each other, and
+    gives every host in allocate_for (a set of aliases) a freshly allocated address
+    instead of the schema default. Addresses the configs already hold are reserved
+    first, so allocation never hands them out. Returns {alias: [problems]}.
+    """
+    aliases = {conf["host_alias"] for conf in configs}
+    # The configs replace whatever their hosts had on disk.
+    used = {ip: [a for a in owned if a not in aliases] for ip, owned in owners(index).items()}
+    for conf in configs:
+        if conf["host_alias"] not in allocate_for:
+            for address in conf.get("wireguard_addresses") or []:
+                try:
+                    reserve(index, address)
+                except ValueError:
+                    pass
+    problems = {}
+    for conf in configs:
+        alias = conf["host_alias"]
+        if alias in allocate_for:
+            subnets = [str(ipaddress.ip_interface(a).network) for a in conf.get("wireguard_addresses") or []
+                       if _is_interface(a)]
+            try:
+                conf["wireguard_addresses"] = [allocate(index, subnets[0] if subnets else None)]
+            except ValueError as e:
+                problems.setdefault(alias, []).append(str(e))
+                continue
+        for address in conf.get("wireguard_addresses") or []:
+            if not _is_interface(address):
+                problems.setdefault(alias, []).append(f"invalid WireGuard address {address!r}")
+                continue
+            ip = str(ipaddress.ip_interface(address).ip)
+            others = [a for a in used.get(ip, []) if a != alias]
+            if others:
+                problems.setdefault(alias, []).append(f"WireGuard address {ip} is already used by {', '.join(others)}")
+            used.setdefault(ip, []).append(alias)
+    return problems
+
+
+def _is_interface(address):
+    try:
+        ipaddress.ip_interface(address)
+        return True
+    except ValueError:
+        return False
+
+
+def print_status(index):
+    for subnet, state in sorted(index["subnets"].items()):
+        used = sum(bin(byte).count("1") for byte in state["bitmap"])
+        print(f"{subnet}: {used} address(es) in use, next candidate offset {state['cursor']}")
+    found = duplicates(index)
+    if found:
+        print("Duplicate WireGuard addresses:")
+        for ip, aliases in found.items():
+            print(f"  {ip}: {', '.join(aliases)}")
+    else:
+        print("No duplicate WireGuard addresses.")
+    return found
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    index = refresh_ipam()
+    if command == "status":
+        sys.exit(1 if print_status(index) else 0)
+    elif command == "next":
+        try:
+            print(allocate(index, sys.argv[2] if len(sys.argv) > 2 else None))
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    else:
+        print("Usage: ipam_manager.py status | next [SUBNET]")
+        sys.exit(1)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Lightweight run instrumentation shared by the manager modules.
+
+  with phase("obtain_roles"):          # timed phase; nested phases become sub-steps
+      ...
+  with span("erp1", "ssh_check"):      # per-host timing, safe to use from worker threads
+      ...
+  count_subprocesses()                 # count every subprocess started from now on
+  write_report()                       # JSON report + Prometheus textfile at the end of a run
+
+Everything is kept in memory until write_report(); recording costs a lock and a clock read.
+"""
+import contextlib
+import json
+import os
+import subprocess
+import threading
+import time
+
+# Where the JSON run report goes.
+REPORT_FILE = os.path.join(".cache", "metrics", "preansible_report.json")
+# Prometheus textfile-collector output. Point PROMETHEUS_TEXTFILE_DIR at node_exporter's
+# --collector.textfile.directory to have it scraped.
+PROM_FILE_NAME = "preansible.prom"
+DEFAULT_PROM_DIR = os.path.join(".cache", "metrics")
+
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_STATE = {}
+# Phase path currently open in the main thread; worker threads without phases of
+# their own attribute their subprocesses to it.
+_MAIN_PATH = [None]
+_ORIGINAL_POPEN = subprocess.Popen
+
+
+def reset():
+    """Clears everything recorded so far and restarts the run clock."""
+    with _LOCK:
+        _STATE.clear()
+        _STATE.update(started=time.time(), clock=time.perf_counter(), phases=[], spans=[], subprocesses={})
+
+
+reset()
+
+
+def _stack():
+    if not hasattr(_LOCAL, "stack"):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Times a phase. Phases opened inside another phase (same thread) are recorded as "outer/inner"."""
+    stack = _stack()
+    stack.append(name)
+    path = "/".join(stack)
+    in_main = threading.current_thread() is threading.main_thread()
+    if in_main:
+        _MAIN_PATH[0] = path
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        stack.pop()
+        if in_main:
+            _MAIN_PATH[0] = "/".join(stack) or None
+        with _LOCK:
+            _STATE["phases"].append({
+                "phase": path,
+                "offset_s": start - _STATE["clock"],
+                "duration_s": duration,
+                "failed": failed,
+            })
+
+
+@contextlib.contextmanager
+def span(host, name):
+    """Times one step for one host."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        with _LOCK:
+            _STATE["spans"].append({"host": host, "span": name, "offset_s": start - _STATE["clock"],
+                                    "duration_s": duration})
+
+
+def record_subprocess(args):
+    """Counts one subprocess, keyed by program name, against the current phase."""
+    if isinstance(args, (list, tuple)):
+        program = str(args[0]) if args else ""
+    else:
+        program = str(args).split()[0] if str(args).strip() else ""
+    program = os.path.basename(program)
+    stack = _stack()
+    current = "/".join(stack) if stack else (_MAIN_PATH[0] or "(none)")
+    with _LOCK:
+        per_program = _STATE["subprocesses"].setdefault(program, {})
+        per_program[current] = per_program.get(current, 0) + 1
+
+
+class _CountingPopen(_ORIGINAL_POPEN):
+    def __init__(self, args, *pargs, **kwargs):
+        record_subprocess(args)
+        super().__init__(args, *pargs, **kwargs)
+
+
+def count_subprocesses():
+    """Counts every subprocess started through the subprocess module from now on."""
+    subprocess.Popen = _CountingPopen
+
+
+def stop_counting_subprocesses():
+    subprocess.Popen = _ORIGINAL_POPEN
+
+
+def build_report():
+    """Returns the run report as a dictionary."""
+    with _LOCK:
+        phases = list(_STATE["phases"])
+        spans = list(_STATE["spans"])
+        subprocesses = {program: dict(per_phase) for program, per_phase in _STATE["subprocesses"].items()}
+        started, clock = _STATE["started"], _STATE["clock"]
+
+    hosts = {}
+    for item in spans:
+        host = hosts.setdefault(item["host"], {"total_s": 0.0, "spans": {}})
+        host["total_s"] += item["duration_s"]
+        host["spans"][item["span"]] = host["spans"].get(item["span"], 0.0) + item["duration_s"]
+
+    return {
+        "started": started,
+        "duration_s": time.perf_counter() - clock,
+        "phases": sorted(phases, key=lambda p: p["offset_s"]),
+        "hosts": hosts,
+        "subprocesses": subprocesses,
+        "subprocess_total": sum(sum(per_phase.values()) for per_phase in subprocesses.values()),
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_prometheus(report, prefix="preansible"):
+    """Formats the report in the Prometheus text exposition format."""
+    lines = [
+        f"# HELP {prefix}_run_duration_seconds Wall time of the last run.",
+        f"# TYPE {prefix}_run_duration_seconds gauge",
+        f"{prefix}_run_duration_seconds {report['duration_s']:.6f}",
+        f"# HELP {prefix}_last_run_timestamp_seconds Start time of the last run.",
+        f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+        f"{prefix}_last_run_timestamp_seconds {report['started']:.3f}",
+        f"# HELP {prefix}_phase_duration_seconds Wall time per phase of the last run.",
+        f"# TYPE {prefix}_phase_duration_seconds gauge",
+    ]
+    totals = {}
+    for item in report["phases"]:
+        totals[item["phase"]] = totals.get(item["phase"], 0.0) + item["duration_s"]
+    lines += [f'{prefix}_phase_duration_seconds{{phase="{_escape(p)}"}} {d:.6f}' for p, d in sorted(totals.items())]
+
+    lines += [
+        f"# HELP {prefix}_subprocesses Subprocesses started in the last run, per program and phase.",
+        f"# TYPE {prefix}_subprocesses gauge",
+    ]
+    for program, per_phase in sorted(report["subprocesses"].items()):
+        for phase_name, count in sorted(per_phase.items()):
+            lines.append(f'{prefix}_subprocesses{{program="{_escape(program)}",phase="{_escape(phase_name)}"}} {count}')
+
+    lines += [
+        f"# HELP {prefix}_host_span_duration_seconds Wall time per host and step in the last run.",
+        f"# TYPE {prefix}_host_span_duration_seconds gauge",
+    ]
+    for host, data in sorted(report["hosts"].items()):
+        for name, duration in sorted(data["spans"].items()):
+            lines.append(f'{prefix}_host_span_duration_seconds{{host="{_escape(host)}",span="{_escape(name)}"}} '
+                         f'{duration:.6f}')
+    return "\n".join(lines) + "\n"
+
+
+def _atomic_write(path, content):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_name = f"{path}.{os.getpid()}.tmp"
+    with open(temp_name, "w") as f:
+        f.write(content)
+    os.replace(temp_name, path)
+
+
+def write_report(report_file=REPORT_FILE, prom_dir=None):
+    """
+    Writes the JSON report and the Prometheus textfile (PROMETHEUS_TEXTFILE_DIR, or
+    .cache/metrics). Both are replaced atomically so collectors never see partial files.
+    Returns the report dictionary.
+    """
+    report = build_report()
+    _atomic_write(report_file, json.dumps(report, indent=2, sort_keys=True))
+    prom_dir = prom_dir or os.environ.get("PROMETHEUS_TEXTFILE_DIR") or DEFAULT_PROM_DIR
+    _atomic_write(os.path.join(prom_dir, PROM_FILE_NAME), format_prometheus(report))
+    return report
+
+
+def print_summary(report):
+    """Prints top-level phase timings and subprocess counts."""
+    print(f"\nRun timing ({report['duration_s']:.2f}s total, {report['subprocess_total']} subprocesses):")
+    for item in report["phases"]:
+        depth = item["phase"].count("/")
+        name = item["phase"].rsplit("/", 1)[-1]
+        print(f"  {'  ' * depth}{name:<{32 - 2 * depth}} {item['duration_s']:8.2f}s")
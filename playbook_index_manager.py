@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import sys
+
+import yaml
+
+# Directory holding the playbooks, one <group>.yml per inventory group plus task files.
+PLAYBOOKS_DIR = "playbooks"
+# Project-local cache directory shared by the managers.
+CACHE_DIR = ".cache"
+# Persistent dependency index, keyed by playbook/task file path.
+INDEX_FILE = os.path.join(CACHE_DIR, "playbook_index.json")
+# Bump when the extraction rules change so stale entries get reparsed.
+INDEX_VERSION = 1
+
+ROLE_KEYS = {
+    "include_role", "import_role",
+    "ansible.builtin.include_role", "ansible.builtin.import_role",
+    "ansible.legacy.include_role", "ansible.legacy.import_role",
+}
+TASK_FILE_KEYS = {
+    "include_tasks", "import_tasks",
+    "ansible.builtin.include_tasks", "ansible.builtin.import_tasks",
+    "ansible.legacy.include_tasks", "ansible.legacy.import_tasks",
+}
+PLAYBOOK_KEYS = {"import_playbook", "ansible.builtin.import_playbook", "ansible.legacy.import_playbook"}
+
+
+def extract_references(data, refs=None):
+    """
+    Recursively walks parsed YAML and collects what it depends on.
+    Returns a dict with sets under "roles", "task_files" and "playbooks";
+    file references are returned exactly as written (unresolved).
+
+    Recognized:
+      - roles: lists on plays (strings, or dicts with "role"/"name"),
+      - include_role / import_role (short, ansible.builtin and ansible.legacy names),
+      - include_tasks / import_tasks (string or {"file": ...}),
+      - import_playbook.
+    Templated references ("{{ ... }}") cannot be resolved statically and are skipped.
+    """
+    if refs is None:
+        refs = {"roles": set(), "task_files": set(), "playbooks": set()}
+    if isinstance(data, dict):
+        if "hosts" in data and isinstance(data.get("roles"), list):
+            for role in data["roles"]:
+                name = role.get("role") or role.get("name") if isinstance(role, dict) else role
+                if isinstance(name, str) and "{{" not in name:
+                    refs["roles"].add(name)
+        for key, value in data.items():
+            if key in ROLE_KEYS:
+                name = value.get("name") if isinstance(value, dict) else value
+                if isinstance(name, str) and "{{" not in name:
+                    refs["roles"].add(name)
+            elif key in TASK_FILE_KEYS or key in PLAYBOOK_KEYS:
+                path = value.get("file") if isinstance(value, dict) else value
+                if isinstance(path, str) and "{{" not in path:
+                    refs["task_files" if key in TASK_FILE_KEYS else "playbooks"].add(path)
+            else:
+                extract_references(value, refs)
+    elif isinstance(data, list):
+        for element in data:
+            extract_references(element, refs)
+    return refs
+
+
+def _file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _resolve(reference, including_file):
+    """Resolves a task/playbook reference relative to the including file, like Ansible does."""
+    base = os.path.dirname(including_file)
+    candidates = [os.path.join(base, reference), os.path.join(base, "tasks", reference)]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return os.path.normpath(candidate)
+    return os.path.normpath(candidates[0])
+
+
+def _parse_file(path):
+    """Parses a YAML file and returns its resolved references plus a parse error (or None)."""
+    refs = {"roles": set(), "task_files": set(), "playbooks": set()}
+    error = None
+    try:
+        with open(path, "r") as f:
+            for doc in yaml.safe_load_all(f):
+                if doc is not None:
+                    extract_references(doc, refs)
+    except (OSError, yaml.YAMLError) as e:
+        error = str(e)
+    return {
+        "roles": sorted(refs["roles"]),
+        "task_files": sorted(_resolve(p, path) for p in refs["task_files"]),
+        "playbooks": sorted(_resolve(p, path) for p in refs["playbooks"]),
+        "error": error,
+    }
+
+
+def load_index(index_file=INDEX_FILE):
+    """Returns the persisted index ({"version": ..., "files": {path: entry}})."""
+    try:
+        with open(index_file, "r") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "files": {}}
+
+
+def save_index(index, index_file=INDEX_FILE):
+    """Atomically writes the index."""
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    temp_name = f"{index_file}.tmp"
+    with open(temp_name, "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(temp_name, index_file)
+
+
+def _update_entry(index, path):
+    """
+    Brings the index entry for path up to date. A file is only reparsed when its
+    content hash changed; matching mtime and size skip even the hash.
+    Returns True if the index changed.
+    """
+    files = index["files"]
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return files.pop(path, None) is not None
+
+    entry = files.get(path)
+    if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return False
+    sha256 = _file_sha256(path)
+    if entry and entry["sha256"] == sha256:
+        entry["mtime_ns"], entry["size"] = stat.st_mtime_ns, stat.st_size
+        return True
+    files[path] = dict(_parse_file(path), mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha256=sha256)
+    return True
+
+
+def refresh_index(playbooks_dir=PLAYBOOKS_DIR, index_file=INDEX_FILE):
+    """
+    Loads the index, updates it for every YAML file under playbooks_dir (recursively)
+    and for every file those reference, drops entries for deleted files, and saves it
+    when anything changed. Returns the index.
+    """
+    index = load_index(index_file)
+    changed = False
+    seen = set()
+    pending = []
+    for root, dirs, files in os.walk(playbooks_dir):
+        dirs.sort()
+        pending.extend(os.path.normpath(os.path.join(root, name)) for name in sorted(files)
+                       if name.endswith((".yml", ".yaml")))
+
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        changed |= _update_entry(index, path)
+        entry = index["files"].get(path)
+        if entry:
+            pending.extend(entry["task_files"] + entry["playbooks"])
+
+    for stale in set(index["files"]) - seen:
+        del index["files"][stale]
+        changed = True
+    if changed:
+        save_index(index, index_file)
+    return index
+
+
+def playbook_dependencies(index, playbook):
+    """
+    Returns {"roles": [...], "task_files": [...], "missing": [...]} needed by playbook,
+    following import_tasks/include_tasks/import_playbook chains transitively.
+    """
+    roles, task_files, missing = set(), set(), set()
+    start = os.path.normpath(playbook)
+    stack, visited = [start], set()
+    while stack:
+        path = stack.pop()
+        if path in visited:
+            continue
+        visited.add(path)
+        entry = index["files"].get(path)
+        if entry is None:
+            missing.add(path)
+            continue
+        if path != start:
+            task_files.add(path)
+        roles.update(entry["roles"])
+        stack.extend(entry["task_files"] + entry["playbooks"])
+    return {"roles": sorted(roles), "task_files": sorted(task_files), "missing": sorted(missing)}
+
+
+def all_roles(index):
+    """Returns the sorted set of roles referenced anywhere in the index."""
+    return sorted({role for entry in index["files"].values() for role in entry["roles"]})
+
+
+def parse_errors(index):
+    """Returns a list of (path, error) for indexed files that failed to parse."""
+    return [(path, entry["error"]) for path, entry in sorted(index["files"].items()) if entry.get("error")]
+
+
+if __name__ == "__main__":
+    # Usage: playbook_index_manager.py [playbook ...]
+    # Without arguments, shows the dependencies of every top-level playbook.
+    index = refresh_index()
+    playbooks = sys.argv[1:] or sorted(
+        os.path.join(PLAYBOOKS_DIR, f) for f in os.listdir(PLAYBOOKS_DIR) if f.endswith((".yml", ".yaml")))
+    for playbook in playbooks:
+        deps = playbook_dependencies(index, playbook)
+        print(f"{playbook}:")
+        print(f"  roles: {', '.join(deps['roles']) or '-'}")
+        print(f"  task files: {', '.join(deps['task_files']) or '-'}")
+        if deps["missing"]:
+            print(f"  missing: {', '.join(deps['missing'])}")
+    for path, error in parse_errors(index):
+        print(f"Error processing file '{path}': {error}")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+# Optional file declaring which groups must finish before another group starts, e.g.
+#   {"docker_hosts": ["wireguard_hosts"]}
+GROUP_DEPENDENCIES_FILE = "group_dependencies.json"
+# Total ansible forks shared by all playbooks running at the same time.
+# Can be overridden with the ANSIBLE_FORK_BUDGET environment variable.
+DEFAULT_FORK_BUDGET = 20
+
+_PRINT_LOCK = threading.Lock()
+
+
+def get_fork_budget(budget=None):
+    """Returns the global fork budget: explicit value, then ANSIBLE_FORK_BUDGET, then the default."""
+    if budget is None:
+        try:
+            budget = int(os.environ.get("ANSIBLE_FORK_BUDGET", DEFAULT_FORK_BUDGET))
+        except ValueError:
+            print("Invalid ANSIBLE_FORK_BUDGET value; using the default.")
+            budget = DEFAULT_FORK_BUDGET
+    return max(1, budget)
+
+
+def load_group_dependencies(dependencies_file=GROUP_DEPENDENCIES_FILE):
+    """Returns the declared group dependencies ({group: [groups it waits for]}), or {} if none."""
+    if not os.path.exists(dependencies_file):
+        return {}
+    with open(dependencies_file, "r") as f:
+        data = json.load(f)
+    return {group: list(deps) for group, deps in data.items()}
+
+
+def _emit(group, line):
+    with _PRINT_LOCK:
+        sys.stdout.write(f"[{group}] {line}")
+        if not line.endswith("\n"):
+            sys.stdout.write("\n")
+        sys.stdout.flush()
+
+
+def _run_group(group, command, env, done):
+    """Runs one playbook, copying its output line by line with a group prefix."""
+    # Reported if anything below raises, so run_schedule never waits on a dead thread.
+    returncode = 1
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   stdin=subprocess.DEVNULL, text=True, errors="replace", bufsize=1, env=env)
+        for line in process.stdout:
+            _emit(group, line)
+        returncode = process.wait()
+    except OSError as e:
+        _emit(group, f"Failed to start {command[0]}: {e}")
+        returncode = 127
+    finally:
+        done.put((group, returncode))
+
+
+def check_dependencies(groups, dependencies):
+    """
+    Returns the declared dependencies restricted to the selected groups.
+    Raises ValueError if they contain a cycle.
+    """
+    selected = set(groups)
+    deps = {g: [d for d in dependencies.get(g, []) if d in selected and d != g] for g in groups}
+    state = {}
+
+    def visit(group, path):
+        if state.get(group) == "done":
+            return
+        if state.get(group) == "active":
+            raise ValueError(f"Group dependency cycle: {' -> '.join(path + [group])}")
+        state[group] = "active"
+        for dep in deps[group]:
+            visit(dep, path + [group])
+        state[group] = "done"
+
+    for group in groups:
+        visit(group, [])
+    return deps
+
+
+def run_schedule(groups, host_sets, build_command, dependencies=None, fork_budget=None, env=None,
+                 build_env=None):
+    """
+    Runs one playbook per group, concurrently where possible.
+
+    A group starts once every selected group it depends on has succeeded and no
+    running group shares a host with it; groups are considered in the given order.
+    Forks from the global budget are split among the groups started together
+    (never more than a group has hosts) and returned to the budget when they finish.
+
+    build_command(group, forks) returns the argument list to run; the optional
+    build_env(group) returns its environment (default env). host_sets maps a
+    group to its hosts. Returns a dict mapping each group to its return code, or to
+    None when it was skipped because a dependency failed.
+    """
+    deps = check_dependencies(groups, dependencies or {})
+    budget = get_fork_budget(fork_budget)
+    pending = list(groups)
+    running = {}
+    results = {}
+    done = queue.Queue()
+
+    while pending or running:
+        # Skip groups whose dependencies failed or were skipped.
+        for group in list(pending):
+            failed = [d for d in deps[group] if d in results and results[d] != 0]
+            if failed:
+                print(f"Skipping group '{group}': dependency {', '.join(failed)} did not succeed.")
+                results[group] = None
+                pending.remove(group)
+
+        busy_hosts = set().union(*(set(host_sets.get(g, [])) for g in running))
+        startable = []
+        for group in pending:
+            hosts = set(host_sets.get(group, []))
+            if all(results.get(d) == 0 for d in deps[group]) and not hosts & busy_hosts:
+                startable.append(group)
+                busy_hosts |= hosts
+
+        available = budget - sum(running.values())
+        if startable and (available > 0 or not running):
+            share = max(1, available // len(startable))
+            for group in startable:
+                if available <= 0 and running:
+                    break
+                forks = max(1, min(share, len(host_sets.get(group, [])) or 1))
+                command = build_command(group, forks)
+                print(f"Executing playbook for group '{group}' with {forks} fork(s): {' '.join(command)}")
+                group_env = build_env(group) if build_env else env
+                thread = threading.Thread(target=_run_group, args=(group, command, group_env, done), daemon=True)
+                thread.start()
+                running[group] = forks
+                available -= forks
+                pending.remove(group)
+
+        if not running:
+            if pending:
+                # Nothing can start and nothing is running: only possible with bad input.
+                for group in pending:
+                    results[group] = None
+                break
+            continue
+
+        group, returncode = done.get()
+        del running[group]
+        results[group] = returncode
+    return results
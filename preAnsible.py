@@ -6,9 +6,11 @@ import json
 from env_validator import validate_environment
 from config_manager import load_all_configs, edit_config
 from ssh_manager import setup_ssh_access, check_ssh_access
-from host_manager import update_hosts_file
+from preflight_manager import run_preflight, print_preflight_summary, usable_targets
+from host_manager import update_hosts_files
 from inventory_manager import generate_inventory
 from ansible_manager import obtain_roles, choose_inventory_groups, run_group_playbooks
+from metrics_manager import phase, count_subprocesses, write_report, print_summary
 
 # Use current user's home directory
 USER_HOME = os.path.expanduser("~")
@@ -17,48 +19,52 @@ USER_HOME = os.path.expanduser("~")
 PROJECT_DIR = os.path.join(USER_HOME, "projects/Logichem/ansible-dokploy-erpnext")
 
 def preAnsible():
+    # Time every phase and count subprocesses; the report is written even if a phase fails.
+    count_subprocesses()
+    try:
+        run_phases()
+    finally:
+        report = write_report()
+        print_summary(report)
+
+def run_phases():
     # Validate environment dependencies, configurations, and required roles.
-    validate_environment()
+    with phase("validate_environment"):
+        validate_environment()
 
     # Interactively edit, and save configuration (non-secret target details)
     # configs = load_all_configs()
-    configs = convert_configs_to_dict(edit_config())
+    with phase("edit_config"):
+        configs = convert_configs_to_dict(edit_config())
     # save_config(config)
 
     # print("configs")
     # print(json.dumps(configs, indent=4))
 
-    # Process each target defined in the configuration.
-    # for target in config.get("targets", []):
-    for config in configs:
-        target = configs[config]
-        # print("target")
-        # print(json.dumps(target, indent=4))
-        print(f"\nProcessing target: {target['host_alias']} ({target['host_ip_or_name']})")
+    # Check, alias, push keys and recheck every target concurrently,
+    # then report once before the playbooks start.
+    with phase("ssh_preflight"):
+        preflight_results = run_preflight(configs)
+    print_preflight_summary(preflight_results)
 
-        # Check SSH access; if not available, attempt configuration.
-        if check_ssh_access(target):
-            print(f"SSH access confirmed for {target['host_alias']}. Skipping SSH setup.")
-        else:
-            print(f"Configuring SSH access for {target['host_alias']}...")
-            setup_ssh_access(target, configure=True)
-            if not check_ssh_access(target):
-                print(f"ERROR: SSH setup failed for {target['host_alias']}. Skipping this target.")
-                continue
+    # Update /etc/hosts on the control machine (one sudo -A write, none if unchanged)
+    with phase("update_hosts_file"):
+        update_hosts_files(usable_targets(configs, preflight_results))
 
-    # Update /etc/hosts on the control machine (using sudo -A)
-    update_hosts_file(target)
-
-    obtain_roles()
+    with phase("obtain_roles"):
+        obtain_roles()
 
 
 
     # generate_inventory()
-    groups_to_process = choose_inventory_groups()
+    with phase("choose_inventory_groups"):
+        groups_to_process = choose_inventory_groups()
     if groups_to_process:
         # Proceed with processing the selected groups.
         print("Processing groups:", groups_to_process)
-        run_group_playbooks(groups_to_process)
+        # Only hosts whose inputs changed are run unless --force is given.
+        with phase("run_group_playbooks"):
+            run_group_playbooks(groups_to_process, force="--force" in sys.argv)
     else:
         print("No groups selected or exiting.")
 
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ssh_manager import check_ssh_access, push_ssh_key, SSH_CONFIG_FILE
+from ssh_config_manager import upsert_ssh_aliases
+from metrics_manager import phase, span
+
+# Default number of targets probed at the same time.
+# Can be overridden with the PREFLIGHT_CONCURRENCY environment variable.
+DEFAULT_CONCURRENCY = 16
+
+
+def get_concurrency(concurrency=None):
+    """
+    Returns the number of targets to probe concurrently.
+    An explicit value wins, then PREFLIGHT_CONCURRENCY, then DEFAULT_CONCURRENCY.
+    """
+    if concurrency is None:
+        try:
+            concurrency = int(os.environ.get("PREFLIGHT_CONCURRENCY", DEFAULT_CONCURRENCY))
+        except ValueError:
+            print("Invalid PREFLIGHT_CONCURRENCY value; using the default.")
+            concurrency = DEFAULT_CONCURRENCY
+    return max(1, concurrency)
+
+
+def _new_result(target):
+    return {
+        "host_alias": target.get("host_alias", "UNKNOWN"),
+        "host_ip_or_name": target.get("host_ip_or_name", ""),
+        "status": "failed",
+        "detail": "",
+    }
+
+
+def check_target(target):
+    """
+    First preflight stage: probes SSH access. Returns a result dictionary with keys
+    host_alias, host_ip_or_name, status ("reachable" or "failed") and detail.
+    """
+    result = _new_result(target)
+    try:
+        with span(result["host_alias"], "ssh_check"):
+            if check_ssh_access(target):
+                result["status"] = "reachable"
+    except (Exception, SystemExit) as e:
+        result["detail"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def configure_target(target):
+    """
+    Second preflight stage, for targets that failed the check and whose alias is
+    already in ~/.ssh/config: pushes the SSH key and rechecks. Returns a result
+    dictionary with status "fixed" or "failed".
+    """
+    result = _new_result(target)
+    alias = result["host_alias"]
+    try:
+        print(f"[{alias}] SSH access not available; configuring...")
+        with span(alias, "ssh_key_push"):
+            push_ssh_key(target)
+
+        with span(alias, "ssh_recheck"):
+            reachable = check_ssh_access(target)
+        if reachable:
+            result["status"] = "fixed"
+        else:
+            result["detail"] = "SSH access still unavailable after setup"
+    except (Exception, SystemExit) as e:
+        # push_ssh_key raises on ssh-copy-id failures and the vault loader may exit;
+        # neither should abort the preflight of the other targets.
+        result["detail"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def preflight_target(target):
+    """
+    Runs the SSH preflight for a single target: check, alias, key push and recheck.
+    status is one of "reachable" (worked straight away), "fixed" (worked after setup)
+    or "failed".
+    """
+    result = check_target(target)
+    if result["status"] == "reachable":
+        return result
+    upsert_ssh_aliases([target], SSH_CONFIG_FILE)
+    return configure_target(target)
+
+
+def run_preflight(targets, concurrency=None):
+    """
+    Runs the preflight for every target, bounded by the concurrency limit:
+    all targets are checked in parallel, the SSH aliases of the unreachable ones
+    are written to ~/.ssh/config in one batch, then their keys are pushed and
+    rechecked in parallel.
+    targets may be a list of host configuration dictionaries or a dict keyed by host_alias.
+    Returns the list of result dictionaries in the same order as the targets.
+    """
+    if isinstance(targets, dict):
+        targets = list(targets.values())
+    if not targets:
+        return []
+
+    workers = min(get_concurrency(concurrency), len(targets))
+    print(f"\nRunning SSH preflight for {len(targets)} target(s) with concurrency {workers}...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(check_target, targets))
+
+        pending = [i for i, r in enumerate(results) if r["status"] != "reachable"]
+        if not pending:
+            return results
+        with phase("ssh_aliases"):
+            try:
+                upsert_ssh_aliases([targets[i] for i in pending], SSH_CONFIG_FILE)
+            except (OSError, KeyError) as e:
+                for i in pending:
+                    results[i]["detail"] = f"Could not write SSH alias: {type(e).__name__}: {e}"
+                return results
+
+        for i, result in zip(pending, executor.map(configure_target, [targets[i] for i in pending])):
+            results[i] = result
+    return results
+
+
+def print_preflight_summary(results):
+    """Prints a single table summarizing reachable, fixed and failed targets."""
+    if not results:
+        print("No targets to summarize.")
+        return
+
+    alias_width = max(len("Host"), *(len(r["host_alias"]) for r in results))
+    addr_width = max(len("Address"), *(len(r["host_ip_or_name"]) for r in results))
+    header = f"{'Host':<{alias_width}}  {'Address':<{addr_width}}  {'Status':<9}  Detail"
+    print("\nSSH preflight summary:")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['host_alias']:<{alias_width}}  {r['host_ip_or_name']:<{addr_width}}  {r['status']:<9}  {r['detail']}")
+
+    counts = {status: 0 for status in ("reachable", "fixed", "failed")}
+    for r in results:
+        counts[r["status"]] += 1
+    print(f"\nReachable: {counts['reachable']}, fixed: {counts['fixed']}, failed: {counts['failed']}")
+
+
+def usable_targets(targets, results):
+    """Returns the targets whose preflight result is reachable or fixed, preserving order."""
+    if isinstance(targets, dict):
+        targets = list(targets.values())
+    return [t for t, r in zip(targets, results) if r["status"] != "failed"]
+
+
+if __name__ == "__main__":
+    from config_manager import load_all_configs
+
+    results = run_preflight(load_all_configs())
+    print_preflight_summary(results)
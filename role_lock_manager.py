@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import subprocess
+
+import yaml
+
+# Lockfile recording the installed name, version and checksum of every galaxy role,
+# in the same shape as a requirements.yml "roles:" list.
+LOCK_FILE = "roles.lock.yml"
+# Written by ansible-galaxy next to each installed role; its install_date changes
+# on every install, so it is left out of the checksum.
+GALAXY_INSTALL_INFO = os.path.join("meta", ".galaxy_install_info")
+
+
+def load_lock(lock_file=LOCK_FILE):
+    """Returns the lockfile entries as a dict keyed by role name."""
+    if not os.path.exists(lock_file):
+        return {}
+    with open(lock_file, "r") as f:
+        data = yaml.safe_load(f) or {}
+    return {entry["name"]: entry for entry in data.get("roles", []) if entry.get("name")}
+
+
+def save_lock(entries, lock_file=LOCK_FILE):
+    """Writes the lockfile entries (dict keyed by role name) sorted by name."""
+    data = {"roles": [entries[name] for name in sorted(entries)]}
+    temp_name = f"{lock_file}.tmp"
+    with open(temp_name, "w") as f:
+        f.write("# Generated by role_lock_manager; refresh with: python ansible_manager.py --upgrade-roles\n")
+        yaml.safe_dump(data, f, default_flow_style=False, sort_keys=False)
+    os.replace(temp_name, lock_file)
+
+
+def role_checksum(role_dir):
+    """Returns "sha256:<hex>" over the relative paths and contents of every file in role_dir."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(role_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, role_dir)
+            if relative == GALAXY_INSTALL_INFO:
+                continue
+            digest.update(relative.encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return f"sha256:{digest.hexdigest()}"
+
+
+def installed_version(role_dir):
+    """Returns the version ansible-galaxy recorded for the installed role, or ""."""
+    info_file = os.path.join(role_dir, GALAXY_INSTALL_INFO)
+    if not os.path.exists(info_file):
+        return ""
+    with open(info_file, "r") as f:
+        info = yaml.safe_load(f) or {}
+    return str(info.get("version") or "")
+
+
+def is_locked_and_installed(role, roles_path, lock):
+    """Returns True if the installed copy of role matches its lockfile entry."""
+    entry = lock.get(role)
+    role_dir = os.path.join(roles_path, role)
+    return bool(entry) and os.path.isdir(role_dir) and role_checksum(role_dir) == entry.get("checksum")
+
+
+def install_roles(roles, roles_path, upgrade=False, lock_file=LOCK_FILE):
+    """
+    Installs the given galaxy roles into roles_path, guided by the lockfile.
+
+    - A role whose installed copy matches the lock is skipped without any network access.
+    - A locked role that is missing or modified is reinstalled at its locked version;
+      if the download doesn't match the locked checksum it is reported as failed and
+      the lock entry is kept.
+    - A role that is not locked yet, or every role when upgrade is True, is installed
+      at the latest version and its lock entry is (re)written.
+
+    Returns a dict mapping role name to "skipped", "installed" or "failed".
+    """
+    lock = load_lock(lock_file)
+    outcome = {}
+    lock_changed = False
+
+    for role in sorted(roles):
+        if not upgrade and is_locked_and_installed(role, roles_path, lock):
+            print(f"Role {role} matches {lock_file}; skipping.")
+            outcome[role] = "skipped"
+            continue
+
+        entry = lock.get(role)
+        role_dir = os.path.join(roles_path, role)
+        spec = role if upgrade or not entry or not entry.get("version") else f"{role},{entry['version']}"
+        command = ["ansible-galaxy", "install", spec, "--roles-path", roles_path]
+        if upgrade or os.path.isdir(role_dir):
+            # Without --force, ansible-galaxy leaves an existing (stale or modified) copy alone.
+            command.append("--force")
+
+        print(f"Installing role: {spec}")
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Error installing {role}:\n{result.stderr}")
+            outcome[role] = "failed"
+            continue
+        checksum = role_checksum(role_dir)
+        if not upgrade and entry and entry.get("checksum") and checksum != entry["checksum"]:
+            # The content behind the locked version changed upstream; keep the lock as evidence.
+            print(f"ERROR: {role} {entry.get('version') or ''} does not match the checksum in {lock_file} "
+                  f"(locked {entry['checksum']}, downloaded {checksum}). Run 'cli.py roles --upgrade' to accept it.")
+            outcome[role] = "failed"
+            continue
+        print(f"Successfully installed {role}")
+        outcome[role] = "installed"
+
+        new_entry = {
+            "name": role,
+            "version": installed_version(role_dir),
+            "checksum": checksum,
+        }
+        if new_entry != entry:
+            lock[role] = new_entry
+            lock_changed = True
+
+    if lock_changed:
+        save_lock(lock, lock_file)
+        print(f"Updated {lock_file}.")
+    return outcome
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Parsed model of ~/.ssh/config for the host aliases this project manages.
+
+Each managed alias lives in a block delimited by a pair of marker comments:
+
+  # Alias configuration: erp1
+  Host erp1
+      ...
+  # Alias configuration: erp1
+
+The file is split into opaque text and alias blocks, indexed by alias, so
+upserting hundreds of aliases is one parse, dictionary lookups and one atomic
+rewrite. Everything outside the markers is kept byte for byte.
+"""
+import os
+import re
+import sys
+import tempfile
+
+from ssh_mux_manager import CONTROL_PATH, CONTROL_PERSIST
+
+USER_HOME = os.path.expanduser("~")
+SSH_CONFIG_FILE = os.path.join(USER_HOME, ".ssh", "config")
+MARKER_PREFIX = "# Alias configuration:"
+
+# Marker lines, with the alias optionally quoted.
+_MARKER_RE = re.compile(r"^#\s*Alias configuration:\s*(['\"]?)(\S+?)\1\s*$")
+_HOST_RE = re.compile(r"^\s*Host\s+(.*)$", re.IGNORECASE)
+
+
+def parse_ssh_config(content):
+    """
+    Splits SSH config content into segments.
+    Returns (segments, index): segments is a list of ["text", lines] and
+    ["alias", alias, lines] entries (lines keep their newlines, alias blocks
+    include both markers); index maps each managed alias to its segment position.
+    A marker without a closing marker is treated as plain text.
+    """
+    lines = content.splitlines(keepends=True)
+    segments, index = [], {}
+    text = []
+    position = 0
+    while position < len(lines):
+        match = _MARKER_RE.match(lines[position].strip())
+        if match:
+            alias = match.group(2)
+            end = position + 1
+            while end < len(lines):
+                closing = _MARKER_RE.match(lines[end].strip())
+                if closing and closing.group(2) == alias:
+                    break
+                end += 1
+            if end < len(lines):
+                if text:
+                    segments.append(["text", text])
+                    text = []
+                index.setdefault(alias, len(segments))
+                segments.append(["alias", alias, lines[position:end + 1]])
+                position = end + 1
+                continue
+        text.append(lines[position])
+        position += 1
+    if text:
+        segments.append(["text", text])
+    return segments, index
+
+
+def unmanaged_hosts(segments):
+    """Returns the set of Host patterns declared outside the managed alias blocks (exact tokens)."""
+    hosts = set()
+    for segment in segments:
+        if segment[0] != "text":
+            continue
+        for line in segment[1]:
+            match = _HOST_RE.match(line)
+            if match:
+                hosts.update(token.strip("\"'") for token in match.group(1).split())
+    return hosts
+
+
+def render_alias_block(target):
+    """Returns the managed block for target as a list of lines."""
+    alias = target["host_alias"]
+    return [
+        f"{MARKER_PREFIX} {alias}\n",
+        f"Host {alias}\n",
+        f"    User {target['ssh_user']}\n",
+        f"    Port {target.get('ssh_port') or 22}\n",
+        f"    HostName {target['host_ip_or_name']}\n",
+        "    ServerAliveInterval 120\n",
+        "    ServerAliveCountMax 20\n",
+        f"    IdentityFile {os.path.join(USER_HOME, '.ssh', target['identity_file'])}\n",
+        "    ControlMaster auto\n",
+        f"    ControlPath {CONTROL_PATH}\n",
+        f"    ControlPersist {CONTROL_PERSIST}\n",
+        f"{MARKER_PREFIX} {alias}\n",
+    ]
+
+
+def upsert_aliases(content, targets):
+    """
+    Adds or replaces the managed block of every target.
+    Returns (new_content, outcome), outcome mapping each alias to "added",
+    "updated", "unchanged" or "skipped" (declared by hand outside the markers,
+    which ssh would match first).
+    """
+    segments, index = parse_ssh_config(content)
+    hand_written = unmanaged_hosts(segments)
+    outcome = {}
+    for target in targets:
+        alias = target["host_alias"]
+        block = render_alias_block(target)
+        if alias in index:
+            segment = segments[index[alias]]
+            if segment[2] == block:
+                outcome[alias] = "unchanged"
+            else:
+                segment[2] = block
+                outcome[alias] = "updated"
+        elif alias in hand_written:
+            outcome[alias] = "skipped"
+        else:
+            # Same layout as the old appender: a blank line before each block.
+            if segments and not "".join(segments[-1][-1]).endswith("\n"):
+                segments.append(["text", ["\n"]])
+            segments.append(["text", ["\n"]])
+            index[alias] = len(segments)
+            segments.append(["alias", alias, block])
+            outcome[alias] = "added"
+    new_content = "".join("".join(segment[-1]) for segment in segments)
+    return new_content, outcome
+
+
+def write_ssh_config(content, config_file=SSH_CONFIG_FILE):
+    """Atomically replaces config_file with content (mode 0600)."""
+    directory = os.path.dirname(config_file) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".config.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(temp_name, 0o600)
+        os.replace(temp_name, config_file)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def upsert_ssh_aliases(targets, config_file=SSH_CONFIG_FILE):
+    """
+    Adds or updates the SSH alias of every target in config_file with one read and,
+    if anything changed, one atomic rewrite. Returns the outcome dictionary from
+    upsert_aliases().
+    """
+    if isinstance(targets, dict):
+        targets = list(targets.values())
+    content = ""
+    if os.path.exists(config_file):
+        with open(config_file, "r") as f:
+            content = f.read()
+
+    new_content, outcome = upsert_aliases(content, targets)
+    if new_content != content:
+        write_ssh_config(new_content, config_file)
+    for alias, state in outcome.items():
+        if state == "added":
+            print(f"Added SSH alias '{alias}' to {config_file}")
+        elif state == "updated":
+            print(f"Updated SSH alias '{alias}' in {config_file}")
+        elif state == "skipped":
+            print(f"SSH alias '{alias}' is defined by hand in {config_file}; leaving it alone.")
+    return outcome
+
+
+if __name__ == "__main__":
+    # Usage: ssh_config_manager.py   refresh the aliases of every configured host
+    from config_manager import load_all_configs
+
+    result = upsert_ssh_aliases(load_all_configs())
+    counts = {}
+    for state in result.values():
+        counts[state] = counts.get(state, 0) + 1
+    print(", ".join(f"{state}: {count}" for state, count in sorted(counts.items())) or "No hosts configured.")
+    sys.exit(0)
@@ -3,41 +3,34 @@ import subprocess
 import tempfile
 import json
 
+from ssh_mux_manager import mux_options, ensure_control_dir
+from ssh_config_manager import upsert_ssh_aliases
+
 # Use current user's home directory
 USER_HOME = os.path.expanduser("~")
 SSH_CONFIG_FILE = os.path.join(USER_HOME, ".ssh", "config")
 
 def check_ssh_access(target):
-    """Checks if SSH access is already set up for the target."""
+    """Checks if SSH access is already set up for the target.
+
+    The probe runs with ControlMaster=auto, so a successful check leaves a
+    persistent master behind that later checks and playbook runs reuse.
+    """
+    ensure_control_dir()
     ssh_test_cmd = [
         "ssh", "-o", "BatchMode=yes", "-o", "ConnectTimeout=5",
+        *mux_options(),
+        "-p", str(target.get("ssh_port") or 22),
         f"{target['ssh_user']}@{target['host_ip_or_name']}", "exit"
     ]
-    result = subprocess.run(ssh_test_cmd, capture_output=True, text=True)
+    # The backgrounded master inherits our stdio, so don't capture it.
+    result = subprocess.run(ssh_test_cmd, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     return result.returncode == 0
 
 def add_ssh_alias(target):
-    """Adds an SSH alias to SSH_CONFIG_FILE if it doesn't already exist."""
-    if os.path.exists(SSH_CONFIG_FILE):
-        with open(SSH_CONFIG_FILE, "r") as ssh_config:
-            if f"Host {target['host_alias']}" in ssh_config.read():
-                return  # Alias already exists
-
-    ssh_config_entry = f"""
-# Alias configuration: {target['host_alias']}
-Host {target['host_alias']}
-    User {target['ssh_user']}
-    Port {target['ssh_port']}
-    HostName {target['host_ip_or_name']}
-    ServerAliveInterval 120
-    ServerAliveCountMax 20
-    IdentityFile {os.path.join(USER_HOME, ".ssh", target['identity_file'])}
-# Alias configuration: {target['host_alias']}
-"""
-    os.makedirs(os.path.dirname(SSH_CONFIG_FILE), exist_ok=True)
-    with open(SSH_CONFIG_FILE, "a") as ssh_config:
-        ssh_config.write(ssh_config_entry)
-    print(f"Added SSH alias '{target['host_alias']}' to {SSH_CONFIG_FILE}")
+    """Adds or updates the SSH alias of target in SSH_CONFIG_FILE (see ssh_config_manager)."""
+    upsert_ssh_aliases([target], SSH_CONFIG_FILE)
 
 def push_ssh_key(target):
     """Uses sshpass to push the SSH key to the target.
@@ -48,21 +41,23 @@ def push_ssh_key(target):
     """
     print(f"Pushing SSH key to {target['host_alias']}...")
     
-    # Obtain the sudo password for this target from the vault.
-    # We import the load_vault_data() function from vault_manager.
-    try:
-        from vault_manager import load_vault_data
-    except ImportError:
-        print("Error: Could not import vault_manager.")
-        return
-
     key = "ansible_become_pass"
 
-    vault_data = load_vault_data(target['host_alias'])
-    if key not in vault_data:
-        print(f"Error: No password for '{key}' found in the vault.")
-        return
-    sudo_password = vault_data[key]
+    # Targets coming from config_manager are already decrypted; only fall back
+    # to the vault when the password isn't part of the target dictionary.
+    sudo_password = target.get(key)
+    if not sudo_password:
+        try:
+            from vault_manager import load_vault_data
+        except ImportError:
+            print("Error: Could not import vault_manager.")
+            return
+
+        vault_data = load_vault_data(target['host_alias'])
+        if key not in vault_data:
+            print(f"Error: No password for '{key}' found in the vault.")
+            return
+        sudo_password = vault_data[key]
     
     # Create a temporary file containing the password.
     with tempfile.NamedTemporaryFile(mode="w", delete=False) as temp_file:
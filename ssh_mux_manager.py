@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Use current user's home directory
+USER_HOME = os.path.expanduser("~")
+# Directory holding one ControlMaster socket per connection.
+CONTROL_DIR = os.path.join(USER_HOME, ".ssh", "cm")
+# %C is a hash of local host, remote host, port and user, so the Python layer,
+# plain "ssh <alias>" and ansible-playbook all resolve to the same socket.
+CONTROL_PATH = os.path.join(CONTROL_DIR, "%C")
+# How long an idle master stays open. Can be overridden with SSH_CONTROL_PERSIST.
+CONTROL_PERSIST = os.environ.get("SSH_CONTROL_PERSIST", "10m")
+
+
+def ensure_control_dir():
+    """Creates CONTROL_DIR with owner-only permissions; ssh refuses to bind sockets elsewhere."""
+    os.makedirs(CONTROL_DIR, mode=0o700, exist_ok=True)
+
+
+def mux_options(master="auto"):
+    """Returns the ssh -o options that make a connection create or reuse a ControlMaster."""
+    return [
+        "-o", f"ControlMaster={master}",
+        "-o", f"ControlPath={CONTROL_PATH}",
+        "-o", f"ControlPersist={CONTROL_PERSIST}",
+    ]
+
+
+def ansible_ssh_args():
+    """
+    Returns the ssh_args string for ansible-playbook (ANSIBLE_SSH_ARGS).
+    It uses the same ControlPath as the Python layer so playbook runs ride on
+    the masters opened during preflight.
+    """
+    return " ".join(["-C"] + mux_options())
+
+
+def ansible_env(env=None):
+    """Returns a copy of env (default os.environ) with ANSIBLE_SSH_ARGS set for multiplexing."""
+    ensure_control_dir()
+    env = dict(os.environ if env is None else env)
+    env["ANSIBLE_SSH_ARGS"] = ansible_ssh_args()
+    return env
+
+
+def _destination(target):
+    """Returns the ssh arguments identifying the target, matching check_ssh_access()."""
+    return ["-p", str(target.get("ssh_port") or 22), f"{target['ssh_user']}@{target['host_ip_or_name']}"]
+
+
+def master_status(target):
+    """Returns True if a ControlMaster for the target is running."""
+    cmd = ["ssh", "-o", f"ControlPath={CONTROL_PATH}", "-O", "check"] + _destination(target)
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+def open_master(target):
+    """
+    Opens a persistent ControlMaster for the target unless one is already running.
+    Returns True if a master is available afterwards.
+    """
+    if master_status(target):
+        return True
+    ensure_control_dir()
+    cmd = (["ssh", "-o", "BatchMode=yes", "-o", "ConnectTimeout=5"] + mux_options("yes")
+           + ["-N", "-f"] + _destination(target))
+    # The backgrounded master inherits our stdio; don't wait on its pipes.
+    result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+def close_master(target):
+    """Asks the target's ControlMaster to exit. Returns True if one was stopped."""
+    cmd = ["ssh", "-o", f"ControlPath={CONTROL_PATH}", "-O", "exit"] + _destination(target)
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+def run_for_targets(action, targets, concurrency=None):
+    """
+    Runs action ("open", "status" or "close") for every target concurrently.
+    Returns a list of (host_alias, bool) tuples in target order.
+    """
+    from preflight_manager import get_concurrency
+
+    func = {"open": open_master, "status": master_status, "close": close_master}[action]
+    if isinstance(targets, dict):
+        targets = list(targets.values())
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=min(get_concurrency(concurrency), len(targets))) as executor:
+        outcomes = list(executor.map(func, targets))
+    return [(t.get("host_alias", "UNKNOWN"), ok) for t, ok in zip(targets, outcomes)]
+
+
+if __name__ == "__main__":
+    # Usage: ssh_mux_manager.py open|status|close [host_alias ...]
+    if len(sys.argv) < 2 or sys.argv[1] not in ("open", "status", "close"):
+        print("Usage: ssh_mux_manager.py open|status|close [host_alias ...]")
+        sys.exit(1)
+
+    from config_manager import load_all_configs
+
+    action = sys.argv[1]
+    wanted = set(sys.argv[2:])
+    targets = [c for c in load_all_configs() if not wanted or c.get("host_alias") in wanted]
+    labels = {
+        "open": ("open", "FAILED to open"),
+        "status": ("running", "not running"),
+        "close": ("closed", "no master"),
+    }[action]
+    for alias, ok in run_for_targets(action, targets):
+        print(f"{alias}: {labels[0] if ok else labels[1]}")
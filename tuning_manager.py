@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Fork/strategy autotuner.
+
+Runs tuning/probe.yml over a grid of fork counts and strategies, measures wall
+time and controller CPU and peak memory for each run, and saves the best
+combination as a named performance profile that run_group_playbooks() applies.
+
+  tuning_manager.py autotune [--name NAME] [--standin N] [--forks 5 10 20]
+                             [--strategies linear free] [--repeats 2]
+  tuning_manager.py list
+  tuning_manager.py use NAME
+
+Without --standin the probe runs against the current inventory. --standin N
+builds a local stand-in fleet of N hosts (connection=local) instead, which tunes
+the controller side without touching any server.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from inventory_manager import INVENTORY_SCRIPT, inventory_groups
+
+PROBE_PLAYBOOK = os.path.join("tuning", "probe.yml")
+# Saved profiles and the active one; measured on this controller, so kept out of git.
+PROFILES_FILE = os.path.join(".cache", "performance_profiles.json")
+TUNING_DIR = os.path.join(".cache", "tuning")
+DEFAULT_FORKS = [5, 10, 20, 50]
+DEFAULT_STRATEGIES = ["linear", "free"]
+# Runs within this fraction of the fastest wall time are ranked by CPU time instead.
+WALL_TIME_TOLERANCE = 0.05
+
+
+def load_profiles(profiles_file=PROFILES_FILE):
+    """Returns {"active": name or None, "profiles": {name: profile}}."""
+    if not os.path.exists(profiles_file):
+        return {"active": None, "profiles": {}}
+    with open(profiles_file, "r") as f:
+        data = json.load(f)
+    data.setdefault("active", None)
+    data.setdefault("profiles", {})
+    return data
+
+
+def save_profiles(data, profiles_file=PROFILES_FILE):
+    os.makedirs(os.path.dirname(profiles_file), exist_ok=True)
+    temp_name = f"{profiles_file}.{os.getpid()}.tmp"
+    with open(temp_name, "w") as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+        f.write("\n")
+    os.replace(temp_name, profiles_file)
+
+
+def active_profile(profiles_file=PROFILES_FILE):
+    """
+    Returns the profile to apply: the one named by ANSIBLE_PERFORMANCE_PROFILE, else
+    the active one in PROFILES_FILE, else None.
+    """
+    data = load_profiles(profiles_file)
+    name = os.environ.get("ANSIBLE_PERFORMANCE_PROFILE") or data["active"]
+    if not name:
+        return None
+    profile = data["profiles"].get(name)
+    if profile is None:
+        print(f"Performance profile '{name}' not found in {profiles_file}; using defaults.")
+        return None
+    return dict(profile, name=name)
+
+
+def profile_env(profile, env=None):
+    """Returns a copy of env (default os.environ) with the profile's Ansible settings applied."""
+    env = dict(os.environ if env is None else env)
+    if profile:
+        env["ANSIBLE_STRATEGY"] = profile["strategy"]
+    return env
+
+
+def write_standin_inventory(count, inventory_file=None):
+    """Writes an inventory of count local stand-in hosts and returns its path."""
+    inventory_file = inventory_file or os.path.join(TUNING_DIR, f"standin-{count}.ini")
+    os.makedirs(os.path.dirname(inventory_file), exist_ok=True)
+    with open(inventory_file, "w") as f:
+        f.write("[standin]\n")
+        for index in range(count):
+            f.write(f"standin{index:04d} ansible_connection=local "
+                    f"ansible_python_interpreter={sys.executable}\n")
+    return inventory_file
+
+
+def run_probe(inventory, forks, strategy, env=None):
+    """
+    Runs the probe playbook once and returns its measurements: wall_s, cpu_s
+    (user + system time of ansible-playbook and its workers), peak_rss_kb and
+    returncode.
+    """
+    command = ["ansible-playbook", "-i", inventory, PROBE_PLAYBOOK, "--forks", str(forks)]
+    run_env = profile_env({"strategy": strategy}, env)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=run_env, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # wait4 reports the usage of the playbook process and the workers it reaped.
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "wall_s": wall,
+        "cpu_s": usage.ru_utime + usage.ru_stime,
+        "peak_rss_kb": usage.ru_maxrss,
+        "returncode": process.returncode,
+    }
+
+
+def rank(results):
+    """
+    Returns the successful results ordered best first: fastest wall time, with runs
+    within WALL_TIME_TOLERANCE of the fastest ordered by CPU time.
+    """
+    ok = [r for r in results if r["returncode"] == 0]
+    if not ok:
+        return []
+    fastest = min(r["wall_s"] for r in ok)
+    near = sorted((r for r in ok if r["wall_s"] <= fastest * (1 + WALL_TIME_TOLERANCE)),
+                  key=lambda r: (r["cpu_s"], r["forks"]))
+    rest = sorted((r for r in ok if r not in near), key=lambda r: r["wall_s"])
+    return near + rest
+
+
+def autotune(name=None, standin=None, forks=None, strategies=None, repeats=1, activate=True):
+    """
+    Benchmarks the probe over forks x strategies and saves the best as profile name
+    (default "<host count>-hosts"). Returns the saved profile, or None if no run succeeded.
+    """
+    from ssh_mux_manager import ansible_env
+
+    if standin:
+        inventory = write_standin_inventory(standin)
+        host_count = standin
+        target = f"{standin} local stand-in host(s)"
+    else:
+        inventory = INVENTORY_SCRIPT
+        host_count = len({h for hosts in inventory_groups().values() for h in hosts})
+        target = f"the current inventory ({host_count} host(s))"
+    if not host_count:
+        print("No hosts to tune against.")
+        return None
+
+    # More forks than hosts behaves like forks == hosts; don't measure it twice.
+    candidates = sorted({min(f, host_count) for f in (forks or DEFAULT_FORKS)})
+    strategies = strategies or DEFAULT_STRATEGIES
+    env = ansible_env()
+    print(f"Autotuning against {target}: forks {candidates}, strategies {strategies}, "
+          f"{repeats} run(s) each.")
+    print(f"{'forks':>5}  {'strategy':<10} {'wall (s)':>9} {'cpu (s)':>8} {'peak RSS (MB)':>13}")
+
+    results = []
+    for strategy in strategies:
+        for fork_count in candidates:
+            runs = [run_probe(inventory, fork_count, strategy, env) for _ in range(repeats)]
+            failed = [r for r in runs if r["returncode"] != 0]
+            result = {
+                "forks": fork_count,
+                "strategy": strategy,
+                # Best of the repeats: the least disturbed run.
+                "wall_s": min(r["wall_s"] for r in runs),
+                "cpu_s": min(r["cpu_s"] for r in runs),
+                "peak_rss_kb": max(r["peak_rss_kb"] for r in runs),
+                "returncode": failed[0]["returncode"] if failed else 0,
+            }
+            results.append(result)
+            note = f"  failed (exit {result['returncode']})" if failed else ""
+            print(f"{fork_count:>5}  {strategy:<10} {result['wall_s']:>9.2f} {result['cpu_s']:>8.2f} "
+                  f"{result['peak_rss_kb'] / 1024:>13.1f}{note}")
+
+    ranked = rank(results)
+    if not ranked:
+        print("Every probe run failed; no profile written.")
+        return None
+    best = ranked[0]
+    name = name or f"{host_count}-hosts"
+    profile = {
+        "forks": best["forks"],
+        "strategy": best["strategy"],
+        "hosts": host_count,
+        "standin": bool(standin),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "measurements": results,
+    }
+    data = load_profiles()
+    data["profiles"][name] = profile
+    if activate:
+        data["active"] = name
+    save_profiles(data)
+    print(f"\nProfile '{name}': forks {best['forks']}, strategy {best['strategy']} "
+          f"({best['wall_s']:.2f}s, {best['cpu_s']:.2f}s CPU){' [active]' if activate else ''}.")
+    return profile
+
+
+def print_profiles():
+    data = load_profiles()
+    if not data["profiles"]:
+        print(f"No performance profiles in {PROFILES_FILE}; run 'tuning_manager.py autotune'.")
+        return
+    for name, profile in sorted(data["profiles"].items()):
+        marker = "*" if name == data["active"] else " "
+        print(f"{marker} {name:<20} forks {profile['forks']:>3}  strategy {profile['strategy']:<8} "
+              f"tuned on {profile['hosts']} {'stand-in ' if profile.get('standin') else ''}host(s) "
+              f"at {profile['created']}")
+
+
+def _option_values(argv, option):
+    """Returns the values following option up to the next --option."""
+    if option not in argv:
+        return None
+    values = []
+    for arg in argv[argv.index(option) + 1:]:
+        if arg.startswith("--"):
+            break
+        values.append(arg)
+    return values
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "list"
+    if command == "autotune":
+        name = (_option_values(args, "--name") or [None])[0]
+        standin = (_option_values(args, "--standin") or [None])[0]
+        forks = _option_values(args, "--forks")
+        repeats = (_option_values(args, "--repeats") or [1])[0]
+        profile = autotune(name=name, standin=int(standin) if standin else None,
+                           forks=[int(f) for f in forks] if forks else None,
+                           strategies=_option_values(args, "--strategies"), repeats=int(repeats))
+        sys.exit(0 if profile else 1)
+    elif command == "use" and len(args) > 1:
+        data = load_profiles()
+        if args[1] not in data["profiles"]:
+            print(f"Unknown profile '{args[1]}'.")
+            sys.exit(1)
+        data["active"] = args[1]
+        save_profiles(data)
+        print(f"Active performance profile: {args[1]}")
+    elif command == "list":
+        print_profiles()
+    else:
+        print("Usage: tuning_manager.py autotune [options] | list | use NAME")
+        sys.exit(1)
@@ -1,6 +1,7 @@
+import functools
 import os
-import pwd
 
+@functools.lru_cache(maxsize=None)
 def get_user_context():
     """
     Returns a dictionary containing:
@@ -8,6 +9,8 @@ def get_user_context():
       - uid: the user ID of the sudoer user
       - gid: the group ID of the sudoer user
     """
+    import pwd
+
     sudo_user = os.getenv("SUDO_USER")
     user_home = os.environ.get("USER_HOME")
     if not user_home:
@@ -28,5 +31,9 @@ def get_user_context():
             uid, gid = os.getuid(), os.getgid()
     return {"user_home": user_home, "uid": uid, "gid": gid}
 
-# Global value object for the sudoer user's context
-USER_CONTEXT = get_user_context()
+def __getattr__(name):
+    # Global value object for the sudoer user's context, looked up on first use
+    # rather than at import time.
+    if name == "USER_CONTEXT":
+        return get_user_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
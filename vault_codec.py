@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+In-process reader/writer for the Ansible Vault "$ANSIBLE_VAULT;1.1;AES256" format.
+
+The format, as produced by ansible-vault:
+  - header line "$ANSIBLE_VAULT;1.1;AES256" (1.2 adds ";<vault-id>")
+  - body: hexlify(hexlify(salt) + "\\n" + hmac_hex + "\\n" + hexlify(ciphertext)),
+    wrapped at 80 characters, with a trailing newline
+  - keys: PBKDF2-HMAC-SHA256(password, salt, 10000 iterations, 80 bytes)
+    split into a 32 byte AES key, a 32 byte HMAC key and a 16 byte CTR nonce
+  - ciphertext: AES-256-CTR over the PKCS7 (128 bit) padded plaintext
+  - hmac: HMAC-SHA256 of the ciphertext with the HMAC key
+
+Using this instead of the ansible-vault CLI avoids starting a Python
+interpreter and importing Ansible for every file.
+"""
+import binascii
+import functools
+import hashlib
+import hmac
+import os
+import tempfile
+
+# Path to the vault password file (same file ansible.cfg points at).
+VAULT_PASS_FILE = os.path.expanduser("~/.ssh/secrets/.vault_pass")
+
+HEADER = "$ANSIBLE_VAULT"
+CIPHER_NAME = "AES256"
+KDF_ITERATIONS = 10000
+SALT_LENGTH = 32
+KEY_LENGTH = 32
+IV_LENGTH = 16
+LINE_WIDTH = 80
+
+# Vault password per password file, read once per process.
+_PASSWORDS = {}
+
+
+class VaultError(Exception):
+    """Raised when vault data cannot be read, decrypted or written."""
+
+
+def _cipher_module():
+    """Imports the AES primitives lazily; cryptography is an ansible-core dependency."""
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        from cryptography.hazmat.primitives import padding
+    except ImportError:
+        raise VaultError("The 'cryptography' package is required (pip install cryptography).")
+    return Cipher, algorithms, modes, padding
+
+
+def read_vault_password(path=None):
+    """
+    Returns the vault password (bytes) from path (default VAULT_PASS_FILE).
+    The file is read once per process; surrounding whitespace is stripped like ansible does.
+    """
+    path = path or VAULT_PASS_FILE
+    if path not in _PASSWORDS:
+        try:
+            with open(path, "rb") as f:
+                password = f.read().strip()
+        except OSError as e:
+            raise VaultError(f"Cannot read vault password file {path}: {e}")
+        if not password:
+            raise VaultError(f"Vault password file {path} is empty.")
+        _PASSWORDS[path] = password
+    return _PASSWORDS[path]
+
+
+def _to_bytes(value):
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+@functools.lru_cache(maxsize=256)
+def _derive_keys(password, salt):
+    """Returns (aes_key, hmac_key, iv) for the password/salt pair."""
+    derived = hashlib.pbkdf2_hmac("sha256", password, salt, KDF_ITERATIONS, 2 * KEY_LENGTH + IV_LENGTH)
+    return derived[:KEY_LENGTH], derived[KEY_LENGTH:2 * KEY_LENGTH], derived[2 * KEY_LENGTH:]
+
+
+def is_encrypted(data):
+    """Returns True if data (str or bytes) starts with the vault header."""
+    return _to_bytes(data).lstrip().startswith(HEADER.encode())
+
+
+def encrypt(plaintext, password=None, salt=None, vault_id=None):
+    """
+    Encrypts plaintext (str or bytes) and returns the vault text as a str.
+    password defaults to the contents of VAULT_PASS_FILE. salt is random unless
+    given, which is only useful for reproducible output. A vault_id other than
+    "default" produces a 1.2 header, as ansible-vault does.
+    """
+    Cipher, algorithms, modes, padding = _cipher_module()
+    password = _to_bytes(password) if password is not None else read_vault_password()
+    salt = salt if salt is not None else os.urandom(SALT_LENGTH)
+    aes_key, hmac_key, iv = _derive_keys(password, salt)
+
+    padder = padding.PKCS7(algorithms.AES.block_size).padder()
+    padded = padder.update(_to_bytes(plaintext)) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(aes_key), modes.CTR(iv)).encryptor()
+    ciphertext = encryptor.update(padded) + encryptor.finalize()
+    digest = hmac.new(hmac_key, ciphertext, hashlib.sha256).hexdigest().encode()
+
+    body = binascii.hexlify(b"\n".join([binascii.hexlify(salt), digest, binascii.hexlify(ciphertext)]))
+    if vault_id and vault_id != "default":
+        header = f"{HEADER};1.2;{CIPHER_NAME};{vault_id}"
+    else:
+        header = f"{HEADER};1.1;{CIPHER_NAME}"
+    lines = [header] + [body[i:i + LINE_WIDTH].decode() for i in range(0, len(body), LINE_WIDTH)]
+    return "\n".join(lines) + "\n"
+
+
+def decrypt(vaulttext, password=None):
+    """
+    Decrypts vault text (str or bytes) and returns the plaintext as a str.
+    Raises VaultError on a malformed envelope, an unsupported cipher or a bad password.
+    """
+    Cipher, algorithms, modes, padding = _cipher_module()
+    lines = _to_bytes(vaulttext).strip().splitlines()
+    if not lines or not is_encrypted(lines[0]):
+        raise VaultError("Input is not vault encrypted data.")
+    header = lines[0].strip().split(b";")
+    if len(header) < 3 or header[2].strip().decode() != CIPHER_NAME:
+        raise VaultError(f"Unsupported vault header: {lines[0].decode(errors='replace')}")
+
+    try:
+        envelope = binascii.unhexlify(b"".join(line.strip() for line in lines[1:]))
+        salt_hex, expected_hmac, ciphertext_hex = envelope.split(b"\n", 2)
+        salt = binascii.unhexlify(salt_hex)
+        ciphertext = binascii.unhexlify(ciphertext_hex)
+    except (binascii.Error, ValueError) as e:
+        raise VaultError(f"Malformed vault data: {e}")
+
+    password = _to_bytes(password) if password is not None else read_vault_password()
+    aes_key, hmac_key, iv = _derive_keys(password, salt)
+    actual_hmac = hmac.new(hmac_key, ciphertext, hashlib.sha256).hexdigest().encode()
+    if not hmac.compare_digest(actual_hmac, expected_hmac):
+        raise VaultError("HMAC verification failed; wrong vault password?")
+
+    decryptor = Cipher(algorithms.AES(aes_key), modes.CTR(iv)).decryptor()
+    padded = decryptor.update(ciphertext) + decryptor.finalize()
+    unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+    try:
+        plaintext = unpadder.update(padded) + unpadder.finalize()
+    except ValueError as e:
+        raise VaultError(f"Invalid padding in vault data: {e}")
+    return plaintext.decode("utf-8")
+
+
+def decrypt_file(path, password=None):
+    """Reads and decrypts the vault file at path, returning the plaintext as a str."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        raise VaultError(f"Cannot read {path}: {e}")
+    return decrypt(data, password)
+
+
+def encrypt_to_file(path, plaintext, password=None, vault_id=None):
+    """
+    Encrypts plaintext and atomically replaces path with the result.
+    The plaintext never touches the disk; the file keeps its previous mode (0600 if new).
+    """
+    vaulttext = encrypt(plaintext, password, vault_id=vault_id)
+    directory = os.path.dirname(path) or "."
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o600
+    fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".vault-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(vaulttext)
+        os.chmod(temp_name, mode)
+        os.replace(temp_name, path)
+    except OSError as e:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise VaultError(f"Cannot write {path}: {e}")
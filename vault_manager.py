@@ -1,9 +1,10 @@
 import os
 import getpass
-import subprocess
 import sys
 import yaml
 
+from vault_codec import decrypt_file, encrypt_to_file, read_vault_password, VaultError
+
 # Use current user's home directory
 USER_HOME = os.path.expanduser("~")
 SECRETS_DIR = os.path.join(USER_HOME, ".ssh", "secrets")
@@ -32,8 +33,6 @@ def load_vault_data(host_alias=None):
     Otherwise, loads and returns a dictionary from host_vars/<host_alias>.yml.
     Returns an empty dict if the file doesn't exist.
     """
-    import os, subprocess, yaml, sys
-    
     if host_alias is None:
         file_to_load = VAULT_FILE  # Global vault file
     else:
@@ -41,30 +40,22 @@ def load_vault_data(host_alias=None):
     
     if os.path.exists(file_to_load):
         try:
-            result = subprocess.run(
-                ["ansible-vault", "view", file_to_load, "--vault-password-file", VAULT_PASS_FILE],
-                capture_output=True, text=True, check=True
-            )
-            data = yaml.safe_load(result.stdout)
+            data = yaml.safe_load(decrypt_file(file_to_load, read_vault_password(VAULT_PASS_FILE)))
             return data if data is not None else {}
-        except subprocess.CalledProcessError as e:
-            print("Error decrypting vault file:", e.stderr)
+        except VaultError as e:
+            print("Error decrypting vault file:", e)
             sys.exit(1)
     else:
         return {}
 
 def write_and_encrypt_vault(data):
-    """Write the YAML data to VAULT_FILE in plaintext then encrypt it using ansible-vault."""
+    """Encrypt the YAML data in-process and atomically replace VAULT_FILE with it."""
     os.makedirs(os.path.dirname(VAULT_FILE), exist_ok=True)
-    with open(VAULT_FILE, "w") as f:
-        yaml.dump(data, f, default_flow_style=False)
-    encrypt_cmd = [
-        "ansible-vault", "encrypt", VAULT_FILE, "--encrypt-vault-id", "default",
-        "--vault-password-file", VAULT_PASS_FILE
-    ]
-    result = subprocess.run(encrypt_cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print("Error encrypting vault file:", result.stderr)
+    try:
+        encrypt_to_file(VAULT_FILE, yaml.dump(data, default_flow_style=False),
+                        read_vault_password(VAULT_PASS_FILE))
+    except VaultError as e:
+        print("Error encrypting vault file:", e)
         sys.exit(1)
     else:
         print("Vault file updated successfully.")
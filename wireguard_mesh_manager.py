@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Builds every host's wireguard_peers from the host configs.
+
+  wireguard_mesh_manager.py [--dry-run]
+
+The topology comes from WIREGUARD_TOPOLOGY_FILE (full mesh when it is absent):
+
+  {"type": "full"}
+  {"type": "hub", "hubs": ["gw1"]}                  spokes only peer with the hubs
+  {"type": "partial", "meshes": [["a", "b", "c"], ["c", "d"]]}
+                                                    each list is fully meshed
+
+Hosts without a key file of their own (missing, unreadable, or shared with
+other hosts) get a key pair, generated in batch into KEYS_DIR on the controller
+(the hosts' wireguard_private_key reads it with a file lookup), and all changed
+host_vars files are written in one pass.
+"""
+import base64
+import copy
+import ipaddress
+import json
+import os
+import re
+import subprocess
+import sys
+
+from config_manager import load_all_configs, save_changed_configs
+
+WIREGUARD_TOPOLOGY_FILE = "wireguard_topology.json"
+# Private keys generated for the hosts, one <host_alias>.key per host.
+KEYS_DIR = os.path.join(os.path.expanduser("~"), ".ssh", "secrets", "wireguard")
+TOPOLOGIES = ("full", "hub", "partial")
+
+_LOOKUP_RE = re.compile(r"^\{\{\s*lookup\('file',\s*'([^']*)'\)\s*\}\}$")
+
+
+def load_topology(topology_file=WIREGUARD_TOPOLOGY_FILE):
+    """Returns the topology dictionary, defaulting to a full mesh."""
+    if not os.path.exists(topology_file):
+        return {"type": "full"}
+    with open(topology_file, "r") as f:
+        topology = json.load(f)
+    if topology.get("type") not in TOPOLOGIES:
+        raise ValueError(f"{topology_file}: type must be one of {', '.join(TOPOLOGIES)}")
+    return topology
+
+
+def generate_keypairs(count):
+    """
+    Returns count (private, public) base64 key pairs. Uses cryptography's X25519,
+    falling back to the wg tool when cryptography isn't installed.
+    """
+    try:
+        from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+        from cryptography.hazmat.primitives import serialization
+    except ImportError:
+        return [_wg_keypair() for _ in range(count)]
+
+    raw = (serialization.Encoding.Raw, serialization.PrivateFormat.Raw, serialization.NoEncryption())
+    pairs = []
+    for _ in range(count):
+        key = X25519PrivateKey.generate()
+        private = key.private_bytes(*raw)
+        public = key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        pairs.append((base64.b64encode(private).decode("ascii"), base64.b64encode(public).decode("ascii")))
+    return pairs
+
+
+def _wg_keypair():
+    private = subprocess.run(["wg", "genkey"], capture_output=True, text=True, check=True).stdout.strip()
+    public = subprocess.run(["wg", "pubkey"], input=private, capture_output=True, text=True,
+                            check=True).stdout.strip()
+    return private, public
+
+
+def public_key_of(private):
+    """Returns the base64 public key for a base64 private key."""
+    try:
+        from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+        from cryptography.hazmat.primitives import serialization
+    except ImportError:
+        return subprocess.run(["wg", "pubkey"], input=private, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    key = X25519PrivateKey.from_private_bytes(base64.b64decode(private))
+    return base64.b64encode(key.public_key().public_bytes(serialization.Encoding.Raw,
+                                                          serialization.PublicFormat.Raw)).decode("ascii")
+
+
+def private_key_path(config):
+    """Returns the controller path wireguard_private_key reads, or None if it isn't a file lookup."""
+    match = _LOOKUP_RE.match(str(config.get("wireguard_private_key") or "").strip())
+    return match.group(1) if match else None
+
+
+def _write_private_key(path, private):
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    fd = os.open(f"{path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(private + "\n")
+    os.replace(f"{path}.tmp", path)
+
+
+def reusable_key_paths(configs):
+    """
+    Returns {alias: path} for the hosts whose private key file can be reused: a
+    readable file that no other host's wireguard_private_key reads (the schema
+    default points every host at the same /etc/wireguard/privatekey).
+    """
+    readers = {}
+    for conf in configs:
+        path = private_key_path(conf)
+        if path:
+            readers.setdefault(path, []).append(conf["host_alias"])
+    return {aliases[0]: path for path, aliases in readers.items()
+            if len(aliases) == 1 and os.path.isfile(path) and os.access(path, os.R_OK)}
+
+
+def ensure_keys(configs, keys_dir=KEYS_DIR):
+    """
+    Makes sure every host has wireguard_public_key and a readable private key file.
+    A private key file only that host reads is reused (its public key is derived);
+    every other host gets a key pair from one generate_keypairs() batch, stored as
+    keys_dir/<alias>.key. Returns the aliases that got new keys.
+    """
+    reusable = reusable_key_paths(configs)
+    missing = []
+    for conf in configs:
+        path = reusable.get(conf["host_alias"])
+        if path is None:
+            missing.append(conf)
+        elif not conf.get("wireguard_public_key"):
+            try:
+                with open(path, "r") as f:
+                    conf["wireguard_public_key"] = public_key_of(f.read().strip())
+            except OSError:
+                missing.append(conf)
+
+    for conf, (private, public) in zip(missing, generate_keypairs(len(missing))):
+        path = os.path.join(keys_dir, f"{conf['host_alias']}.key")
+        _write_private_key(path, private)
+        conf["wireguard_private_key"] = f"{{{{ lookup('file', '{path}') }}}}"
+        conf["wireguard_public_key"] = public
+    return [conf["host_alias"] for conf in missing]
+
+
+def _host_routes(addresses):
+    """Returns the /32 (or /128) route of every interface address."""
+    routes = []
+    for address in addresses:
+        ip = ipaddress.ip_interface(address).ip
+        routes.append(f"{ip}/{ip.max_prefixlen}")
+    return routes
+
+
+def _networks(addresses):
+    return [str(ipaddress.ip_interface(a).network) for a in addresses]
+
+
+def neighbours(aliases, topology):
+    """Returns {alias: [aliases it peers with]} for the topology, in host order."""
+    kind = topology.get("type", "full")
+    if kind == "full":
+        return {alias: [other for other in aliases if other != alias] for alias in aliases}
+
+    known = set(aliases)
+    if kind == "hub":
+        hubs = [h for h in topology.get("hubs", []) if h in known]
+        if not hubs:
+            raise ValueError("hub topology needs at least one configured host in 'hubs'")
+        hub_set = set(hubs)
+        return {alias: [other for other in aliases if other != alias] if alias in hub_set else list(hubs)
+                for alias in aliases}
+
+    links = {alias: set() for alias in aliases}
+    for mesh in topology.get("meshes", []):
+        members = [m for m in mesh if m in known]
+        for member in members:
+            links[member].update(m for m in members if m != member)
+    order = {alias: position for position, alias in enumerate(aliases)}
+    return {alias: sorted(peers, key=order.get) for alias, peers in links.items()}
+
+
+def build_peers(configs, topology):
+    """
+    Returns {alias: wireguard_peers} for every host. Each host's peer entry is built
+    once and looked up by alias. In a hub topology, spokes route the first hub's
+    whole networks through it; everywhere else a peer is routed its own addresses only.
+    """
+    by_alias = {conf["host_alias"]: conf for conf in configs}
+    entries = {}
+    for alias, conf in by_alias.items():
+        entries[alias] = {
+            "public_key": conf["wireguard_public_key"],
+            "allowed_ips": _host_routes(conf.get("wireguard_addresses") or []),
+            "endpoint": f"{conf['host_ip_or_name']}:{conf.get('wireguard_listen_port') or 51820}",
+        }
+
+    hub_set = set(topology.get("hubs", [])) if topology.get("type") == "hub" else set()
+    # WireGuard rejects overlapping allowed_ips across peers, so only the first hub
+    # carries the networks; further hubs are reached on their own addresses.
+    gateway = next((h for h in topology.get("hubs", []) if h in by_alias), None) if hub_set else None
+    peers = {}
+    for alias, others in neighbours(list(by_alias), topology).items():
+        peer_list = []
+        for other in others:
+            entry = entries[other]
+            if other == gateway and alias not in hub_set:
+                entry = dict(entry, allowed_ips=_networks(by_alias[other].get("wireguard_addresses") or []))
+            peer_list.append(entry)
+        peers[alias] = peer_list
+    return peers
+
+
+def check_configs(configs):
+    """Returns a list of problems that would make the mesh unusable."""
+    problems = []
+    seen = {}
+    seen_keys = {}
+    for conf in configs:
+        alias = conf["host_alias"]
+        if not conf.get("host_ip_or_name"):
+            problems.append(f"{alias}: host_ip_or_name is empty")
+        for address in conf.get("wireguard_addresses") or []:
+            try:
+                ip = str(ipaddress.ip_interface(address).ip)
+            except ValueError:
+                problems.append(f"{alias}: invalid WireGuard address {address!r}")
+                continue
+            if ip in seen:
+                problems.append(f"{alias}: WireGuard address {ip} is also used by {seen[ip]}")
+            seen.setdefault(ip, alias)
+        key = conf.get("wireguard_public_key")
+        if key:
+            if key in seen_keys:
+                problems.append(f"{alias}: wireguard_public_key is also used by {seen_keys[key]}")
+            seen_keys.setdefault(key, alias)
+    return problems
+
+
+def build_mesh(dry_run=False, topology_file=WIREGUARD_TOPOLOGY_FILE):
+    """
+    Fills in keys and wireguard_peers for every host and saves the changed host_vars
+    in one batch. Returns the {alias: changed fields} dict from save_changed_configs(),
+    or None when the configs have problems.
+    """
+    configs = load_all_configs()
+    if not configs:
+        print("No host configurations found.")
+        return None
+    topology = load_topology(topology_file)
+    originals = [copy.deepcopy(conf) for conf in configs]
+
+    if dry_run:
+        reusable = reusable_key_paths(configs)
+        missing = [c["host_alias"] for c in configs if c["host_alias"] not in reusable]
+        if missing:
+            print(f"Would generate key pairs for: {', '.join(missing)}")
+            for conf in configs:
+                conf.setdefault("wireguard_public_key", "")
+                if conf["host_alias"] in missing:
+                    conf["wireguard_public_key"] = f"(new key for {conf['host_alias']})"
+    else:
+        generated = ensure_keys(configs)
+        if generated:
+            print(f"Generated WireGuard key pairs for {len(generated)} host(s) in {KEYS_DIR}.")
+
+    # Checked once the keys are settled, so hosts sharing a key file don't trip it.
+    problems = check_configs(configs)
+    if problems:
+        print("Cannot build the WireGuard mesh:")
+        for problem in problems:
+            print(f"  {problem}")
+        return None
+
+    peers = build_peers(configs, topology)
+    for conf in configs:
+        conf["wireguard_peers"] = peers[conf["host_alias"]]
+    total = sum(len(p) for p in peers.values())
+    print(f"WireGuard {topology.get('type', 'full')} topology: {len(configs)} host(s), {total} peer entries.")
+
+    if dry_run:
+        for conf, original in zip(configs, originals):
+            fields = [f for f in ("wireguard_peers", "wireguard_public_key", "wireguard_private_key")
+                      if conf.get(f) != original.get(f)]
+            if fields:
+                print(f"  {conf['host_alias']}: {', '.join(fields)}")
+        print("Dry run; nothing was written.")
+        return {}
+    return save_changed_configs(configs, originals)
+
+
+if __name__ == "__main__":
+    try:
+        result = build_mesh(dry_run="--dry-run" in sys.argv)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    sys.exit(0 if result is not None else 1)